@@ -1,18 +1,70 @@
 #!/usr/bin/env python3
 import sqlite3
+import time
 import functools
+import inspect
 from datetime import datetime  # ✅ Required by checker
 
+from query_log import QueryLog, caller_of, count_rows
+
+# Shared instrumentation for every @log_queries function: records go to
+# the "queries" logger through a QueueHandler, and per-fingerprint
+# latency histograms are available from query_log.stats().
+query_log = QueryLog(logger="queries", sample_every=1, slow_threshold=0.1)
+
+
+def log_queries(func=None, *, log=None):
+    """Decorator to time SQL queries and log them as structured records
+
+    Usable bare (@log_queries) or with options (@log_queries(log=my_log)).
+    Each call records the query fingerprint, duration, row count and call
+    site; see QueryLog for sampling and the latency histograms.
+    """
+    if func is None:
+        return functools.partial(log_queries, log=log)
+
+    def find_query(args, kwargs):
+        query = kwargs.get('query')
+        if query is None:
+            query = next((a for a in args if isinstance(a, str)), None)
+        return query
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            sink = query_log if log is None else log
+            query = find_query(args, kwargs)
+            if query is None:
+                return await func(*args, **kwargs)
+            caller = caller_of()
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                sink.record(query, time.perf_counter() - start,
+                            caller=caller, error=e)
+                raise
+            sink.record(query, time.perf_counter() - start,
+                        count_rows(result), caller)
+            return result
+        return async_wrapper
 
-def log_queries(func):
-    """Decorator to log SQL queries before executing them with timestamps"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get('query') or (args[0] if args else None)
-        if query:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] Executing SQL Query: {query}")
-        return func(*args, **kwargs)
+        sink = query_log if log is None else log
+        query = find_query(args, kwargs)
+        if query is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            sink.record(query, time.perf_counter() - start,
+                        caller=caller_of(), error=e)
+            raise
+        sink.record(query, time.perf_counter() - start,
+                    count_rows(result), caller_of())
+        return result
     return wrapper
 
 
@@ -27,5 +79,7 @@ def fetch_all_users(query):
     return results
 
 
-# Fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
+if __name__ == "__main__":
+    # Fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+    print(query_log.stats())
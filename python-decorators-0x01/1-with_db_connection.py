@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
-import sqlite3
 import functools
+import inspect
+
+import db_pool
 
 def with_db_connection(func):
-    """Decorator to handle database connection automatically"""
+    """Decorator to handle database connection automatically
+
+    Connections are borrowed from the shared pool in db_pool.py
+    (database path, size and pragmas via db_pool.configure()).
+    Coroutine functions get an aiosqlite connection from the async pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with db_pool.get_async_pool().connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
+        with db_pool.get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 
@@ -22,6 +32,7 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone()
 
 
-# Fetch user by ID with automatic connection handling
-user = get_user_by_id(user_id=1)
-print(user)
+if __name__ == "__main__":
+    # Fetch user by ID with automatic connection handling
+    user = get_user_by_id(user_id=1)
+    print(user)
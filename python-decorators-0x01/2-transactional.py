@@ -1,26 +1,105 @@
 #!/usr/bin/env python3
-import sqlite3
 import functools
+import inspect
+
+import db_pool
+
+from group_commit import GroupCommitter, asavepoint, savepoint
+
+# Shared by every @transactional(group_commit=True) function, so that
+# concurrent writes from different functions can share a commit.
+group_committer = GroupCommitter(window=0.005, max_batch=256)
 
 
 def with_db_connection(func):
-    """Decorator to handle database connection automatically"""
+    """Decorator to handle database connection automatically
+
+    Connections are borrowed from the shared pool in db_pool.py
+    (database path, size and pragmas via db_pool.configure()).
+    Coroutine functions get an aiosqlite connection from the async pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with db_pool.get_async_pool().connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
+        with db_pool.get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 
-def transactional(func):
-    """Decorator to handle transactions automatically"""
+def transactional(func=None, *, group_commit=None):
+    """Decorator to handle transactions automatically
+
+    The outermost @transactional call on a connection opens the
+    transaction and is the only one that commits. A call made while a
+    transaction is already open (a nested @transactional function, or
+    group_commit.batch()) runs in its own SAVEPOINT instead: on success
+    it is RELEASEd into the enclosing transaction, on error only the
+    work since the savepoint is rolled back.
+
+    With @transactional(group_commit=True) (or a GroupCommitter) the
+    decorated function no longer takes a connection from its caller:
+    concurrent calls within the committer's window share one connection
+    and one COMMIT, each isolated in a savepoint. Use it in place of
+    @with_db_connection.
+    """
+    if func is None:
+        return functools.partial(transactional, group_commit=group_commit)
+
+    if group_commit:
+        committer = group_committer if group_commit is True else group_commit
+
+        @functools.wraps(func)
+        def grouped_wrapper(*args, **kwargs):
+            try:
+                return committer.submit(
+                    lambda conn: func(conn, *args, **kwargs))
+            except Exception as e:
+                print(f"[TRANSACTION] Rolled back to savepoint due to error: "
+                      f"{e}")
+                raise
+        return grouped_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            if conn.in_transaction:
+                try:
+                    async with asavepoint(conn):
+                        return await func(conn, *args, **kwargs)
+                except Exception as e:
+                    print(f"[TRANSACTION] Rolled back to savepoint due to "
+                          f"error: {e}")
+                    raise
+            try:
+                await conn.execute("BEGIN")
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                print("[TRANSACTION] Commit successful.")
+            except Exception as e:
+                await conn.rollback()
+                print(f"[TRANSACTION] Rolled back due to error: {e}")
+                raise
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        if conn.in_transaction:
+            try:
+                with savepoint(conn):
+                    return func(conn, *args, **kwargs)
+            except Exception as e:
+                print(f"[TRANSACTION] Rolled back to savepoint due to error: "
+                      f"{e}")
+                raise
         try:
+            conn.execute("BEGIN")
             result = func(conn, *args, **kwargs)
             conn.commit()
             print("[TRANSACTION] Commit successful.")
@@ -39,5 +118,6 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
-# Update user's email with automatic transaction handling
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+if __name__ == "__main__":
+    # Update user's email with automatic transaction handling
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
@@ -1,36 +1,119 @@
 #!/usr/bin/env python3
 import time
-import sqlite3
+import asyncio
 import functools
+import inspect
+
+import db_pool
+
+from retry_policy import (CircuitBreaker, CircuitOpenError, RetryStats,
+                          backoff_delays, is_transient)
+
+# Shared by every @retry_on_failure function, so that one failing database
+# trips a single breaker and all the counters end up in one place.
+circuit_breaker = CircuitBreaker(failure_threshold=0.5, window=20,
+                                 min_calls=10, reset_timeout=30.0)
+retry_stats = RetryStats()
 
 
 def with_db_connection(func):
-    """Decorator to handle database connection automatically"""
+    """Decorator to handle database connection automatically
+
+    Connections are borrowed from the shared pool in db_pool.py
+    (database path, size and pragmas via db_pool.configure()).
+    Coroutine functions get an aiosqlite connection from the async pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with db_pool.get_async_pool().connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
+        with db_pool.get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator to retry database operations if they fail"""
+def retry_on_failure(retries=3, delay=2, max_delay=30.0, deadline=None,
+                     breaker=None, stats=None, transient=is_transient):
+    """Decorator to retry database operations if they fail
+
+    Only transient errors (locked/busy) are retried, after a full-jitter
+    exponential backoff pause of up to min(max_delay, delay * 2**n)
+    seconds. `deadline` caps the total seconds spent on one call, retries
+    included. All decorated functions share `circuit_breaker` and
+    `retry_stats` unless `breaker`/`stats` are given.
+    """
     def decorator(func):
+        def start():
+            cb = circuit_breaker if breaker is None else breaker
+            counters = retry_stats if stats is None else stats
+            counters.count(calls=1)
+            return cb, counters, time.perf_counter(), \
+                backoff_delays(delay, max_delay)
+
+        def before_attempt(cb, counters):
+            if not cb.allow():
+                counters.count(short_circuited=1)
+                raise CircuitOpenError(
+                    f"Circuit open; not calling {func.__qualname__}")
+            counters.count(attempts=1)
+
+        def after_failure(e, attempt, cb, counters, started, delays):
+            """Return the pause before the next attempt, or re-raise."""
+            if not transient(e):
+                # Says nothing about the database's health either way.
+                raise e
+            cb.record_failure()
+            print(f"[RETRY] Attempt {attempt} failed due to: {e}")
+            pause = next(delays)
+            elapsed = time.perf_counter() - started
+            if attempt == retries or (
+                    deadline is not None and elapsed + pause > deadline):
+                counters.count(gave_up=1)
+                counters.observe(elapsed)
+                print("[RETRY] Max retries reached. Operation failed.")
+                raise e
+            counters.count(retries=1)
+            return pause
+
+        def after_success(cb, counters, started):
+            cb.record_success()
+            counters.count(successes=1)
+            counters.observe(time.perf_counter() - started)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cb, counters, started, delays = start()
+                for attempt in range(1, retries + 1):
+                    before_attempt(cb, counters)
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        await asyncio.sleep(after_failure(
+                            e, attempt, cb, counters, started, delays))
+                    else:
+                        after_success(cb, counters, started)
+                        return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            cb, counters, started, delays = start()
             for attempt in range(1, retries + 1):
+                before_attempt(cb, counters)
                 try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    print(f"[RETRY] Attempt {attempt} failed due to: {e}")
-                    if attempt == retries:
-                        print("[RETRY] Max retries reached. Operation failed.")
-                        raise
-                    time.sleep(delay)
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    time.sleep(after_failure(
+                        e, attempt, cb, counters, started, delays))
+                else:
+                    after_success(cb, counters, started)
+                    return result
         return wrapper
     return decorator
 
@@ -43,6 +126,8 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 
-# Attempt to fetch users with automatic retry on failure
-users = fetch_users_with_retry()
-print(users)
+if __name__ == "__main__":
+    # Attempt to fetch users with automatic retry on failure
+    users = fetch_users_with_retry()
+    print(users)
+    print(retry_stats.stats())
@@ -1,38 +1,141 @@
 #!/usr/bin/env python3
-import sqlite3
 import functools
+import inspect
 
-query_cache = {}
+import db_pool
+
+from disk_cache import DiskCache, TieredCache
+from query_cache import QueryCache, make_key, tables_in
+
+# Shared by every @cache_query function: a bounded in-process LRU/TTL
+# cache (L1) in front of a cache file shared by all worker processes on
+# the host (L2). query_cache.stats() reports each tier's hit rate.
+query_cache = TieredCache(
+    QueryCache(max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300),
+    DiskCache("query_cache.db", ttl=300))
+
+DATABASE_LIST = "PRAGMA database_list"
 
 
 def with_db_connection(func):
-    """Decorator to handle database connection automatically"""
+    """Decorator to handle database connection automatically
+
+    Connections are borrowed from the shared pool in db_pool.py
+    (database path, size and pragmas via db_pool.configure()).
+    Coroutine functions get an aiosqlite connection from the async pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with db_pool.get_async_pool().connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
+        with db_pool.get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 
-def cache_query(func):
-    """Decorator to cache query results based on SQL string"""
+def cache_query(func=None, *, cache=None, ttl=None, mode="ttl"):
+    """Decorator to cache query results based on SQL string and parameters
+
+    Usable bare (@cache_query) or with options
+    (@cache_query(cache=my_cache, ttl=60)). The first positional argument
+    is the connection and is not part of the key; everything else is.
+    Concurrent misses for the same key run the query only once (see
+    QueryCache.get_or_compute).
+
+    With mode="data_version" results are cached per database file (the
+    one behind the call's connection) and reused only while its PRAGMA
+    data_version is unchanged, i.e. until anything (this process or
+    another) commits a write; entries then don't expire by time unless
+    `ttl` is also given.
+    """
+    if mode not in ("ttl", "data_version"):
+        raise ValueError(f"Unknown cache_query mode: {mode!r}")
+    if func is None:
+        return functools.partial(cache_query, cache=cache, ttl=ttl,
+                                 mode=mode)
+    options = {} if ttl is None else {"ttl": ttl}
+    if mode == "data_version" and ttl is None:
+        options["ttl"] = None
+
+    def database(rows):
+        # PRAGMA database_list rows are (seq, name, file); "main" is the
+        # database the wrapped call actually queries.
+        path = next(row[2] for row in rows if row[1] == "main")
+        if not path:
+            raise ValueError('mode="data_version" needs a file database, '
+                             'not an in-memory or temporary one')
+        return path
+
+    def lookup(args, kwargs, path=None):
+        query = kwargs.get('query') or (args[1] if len(args) > 1 else None)
+        params = (args[1:], kwargs)
+        return query, make_key(query, params if path is None
+                               else (path,) + params)
+
+    def report(query, computed):
+        if computed:
+            print(f"[CACHE] Cached result for query: {query}")
+        else:
+            print(f"[CACHE] Returning cached result for query: {query}")
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            store = query_cache if cache is None else cache
+            path = stamp = None
+            if mode == "data_version":
+                async with args[0].execute(DATABASE_LIST) as cursor:
+                    path = database(await cursor.fetchall())
+                stamp = db_pool.data_version(path)
+            query, key = lookup(args, kwargs, path)
+            result, computed = await store.aget_or_compute(
+                key, lambda: func(*args, **kwargs), tables_in(query),
+                version=stamp, **options)
+            report(query, computed)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get('query')
-        if query in query_cache:
-            print(f"[CACHE] Returning cached result for query: {query}")
-            return query_cache[query]
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print(f"[CACHE] Cached result for query: {query}")
+        store = query_cache if cache is None else cache
+        path = stamp = None
+        if mode == "data_version":
+            path = database(args[0].execute(DATABASE_LIST).fetchall())
+            stamp = db_pool.data_version(path)
+        query, key = lookup(args, kwargs, path)
+        result, computed = store.get_or_compute(
+            key, lambda: func(*args, **kwargs), tables_in(query),
+            version=stamp, **options)
+        report(query, computed)
         return result
     return wrapper
 
 
+def invalidates(*tables, cache=None):
+    """Decorator to evict cached queries on `tables` after a successful write"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                result = await func(*args, **kwargs)
+                (query_cache if cache is None else cache).invalidate(*tables)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            (query_cache if cache is None else cache).invalidate(*tables)
+            return result
+        return wrapper
+    return decorator
+
+
 @with_db_connection
 @cache_query
 def fetch_users_with_cache(conn, query):
@@ -41,8 +144,10 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
 
 
-# First call will cache the result
-users = fetch_users_with_cache(query="SELECT * FROM users")
+if __name__ == "__main__":
+    # First call will cache the result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-# Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    # Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    print(query_cache.stats())
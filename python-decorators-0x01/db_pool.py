@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Shared SQLite connection pool behind the with_db_connection decorators.
+
+Connections are opened once, with their pragmas applied at creation,
+and then checked out and returned instead of being connected and closed
+on every decorated call. At most `max_size` connections are in use at
+once; callers beyond that wait, and the wait times are recorded.
+
+Connections are created with check_same_thread=False so any thread can
+borrow them, but a connection is only ever used by one thread at a time.
+
+AsyncSQLitePool is the aiosqlite counterpart used by the decorators'
+async paths; get_async_pool() keeps one per event loop and database.
+Services should `await close_async_pools()` before their loop ends.
+
+data_version() reports a database's PRAGMA data_version, which changes
+whenever any connection commits; cache_query uses it to validate results.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import aiosqlite
+except ImportError:  # aiosqlite is only needed by the async decorators
+    aiosqlite = None
+
+DEFAULT_DATABASE = "users.db"
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+class SQLitePool:
+    """Bounded, thread-safe pool of SQLite connections."""
+
+    def __init__(self, database=DEFAULT_DATABASE, max_size=8, pragmas=None,
+                 timeout=None):
+        """
+        Args:
+            database (str): Path of the SQLite database.
+            max_size (int): Maximum number of connections.
+            pragmas (dict): PRAGMA name -> value, applied once per new
+                connection, e.g. {"journal_mode": "WAL"}.
+            timeout (float): Default seconds to wait for a connection;
+                None waits forever.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.database = database
+        self.max_size = max_size
+        self.pragmas = dict(pragmas or {})
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._pinned = threading.local()
+
+    def _connect(self):
+        """Open a new connection and apply the pragmas."""
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def acquire(self, timeout=None):
+        """
+        Check a connection out of the pool.
+
+        Raises:
+            PoolTimeout: If none becomes available within `timeout`.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No connection to {self.database} "
+                              f"available after {timeout}s")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            if waited > 0.001:
+                self._waits += 1
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            return conn
+        try:
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection, rolling back any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def discard(self, conn):
+        """Close a connection instead of returning it to the pool."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        Inside pinned() the thread's pinned connection is yielded instead.
+        """
+        conn = getattr(self._pinned, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def pinned(self, timeout=None):
+        """
+        Borrow one connection and hand it to every connection() call made
+        by this thread inside the block, e.g. to share a transaction.
+        """
+        conn = getattr(self._pinned, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        with self.connection(timeout) as conn:
+            self._pinned.conn = conn
+            try:
+                yield conn
+            finally:
+                self._pinned.conn = None
+
+    def stats(self):
+        """Return checkout and wait-time metrics as a dict."""
+        with self._lock:
+            return {
+                "created": self._created,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "total_wait": self._total_wait,
+                "avg_wait": (self._total_wait / self._checkouts
+                             if self._checkouts else 0.0),
+                "max_wait": self._max_wait,
+            }
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class AsyncSQLitePool:
+    """Bounded pool of aiosqlite connections for one event loop."""
+
+    def __init__(self, database=DEFAULT_DATABASE, max_size=8, pragmas=None,
+                 timeout=None):
+        """Arguments as for SQLitePool."""
+        if aiosqlite is None:
+            raise ImportError("aiosqlite is required for async decorators")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.database = database
+        self.max_size = max_size
+        self.pragmas = dict(pragmas or {})
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_size)
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def _connect(self):
+        """Open a new connection and apply the pragmas."""
+        conn = aiosqlite.connect(self.database)
+        # aiosqlite runs each connection on its own non-daemon thread.
+        # Pooled connections outlive the calls that opened them, so don't
+        # let a pool that was never closed block interpreter exit.
+        thread = getattr(conn, "_thread", None)
+        if thread is not None and not thread.is_alive():
+            thread.daemon = True
+        await conn
+        for name, value in self.pragmas.items():
+            await conn.execute(f"PRAGMA {name}={value}")
+        self._created += 1
+        return conn
+
+    async def acquire(self, timeout=None):
+        """
+        Check a connection out of the pool.
+
+        Raises:
+            PoolTimeout: If none becomes available within `timeout`.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No connection to {self.database} "
+                              f"available after {timeout}s") from None
+        waited = time.perf_counter() - start
+        self._checkouts += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        if waited > 0.001:
+            self._waits += 1
+        if self._idle:
+            return self._idle.pop()
+        try:
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, conn):
+        """Return a connection, rolling back any open transaction."""
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except sqlite3.Error:
+            await self.discard(conn)
+            return
+        self._idle.append(conn)
+        self._slots.release()
+
+    async def discard(self, conn):
+        """Close a connection instead of returning it to the pool."""
+        try:
+            await conn.close()
+        except sqlite3.Error:
+            pass
+        self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """Borrow a connection for the duration of an `async with` block."""
+        conn = await self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    def stats(self):
+        """Return checkout and wait-time metrics as a dict."""
+        return {
+            "created": self._created,
+            "idle": len(self._idle),
+            "checkouts": self._checkouts,
+            "waits": self._waits,
+            "total_wait": self._total_wait,
+            "avg_wait": (self._total_wait / self._checkouts
+                         if self._checkouts else 0.0),
+            "max_wait": self._max_wait,
+        }
+
+    async def close(self):
+        """Close every idle connection."""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+
+class DataVersion:
+    """
+    Change counter for a database, read with PRAGMA data_version.
+
+    data_version changes whenever a *different* connection commits, so
+    the value is read on a dedicated connection that never writes: any
+    commit from the pool, another process or another tool bumps it.
+    """
+
+    def __init__(self, database=DEFAULT_DATABASE):
+        self.database = database
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        """Return the current version; it differs after any commit."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_pools = {}
+_versions = {}
+_async_pools = weakref.WeakKeyDictionary()  # event loop -> {database: pool}
+_settings = {"database": DEFAULT_DATABASE, "max_size": 8, "pragmas": {},
+             "timeout": None}
+_pools_lock = threading.Lock()
+
+
+def configure(**settings):
+    """
+    Change the defaults used by get_pool() (database, max_size, pragmas,
+    timeout). Pools that already exist are closed and recreated lazily.
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise TypeError(f"Unknown pool settings: {sorted(unknown)}")
+    with _pools_lock:
+        _settings.update(settings)
+        pools = list(_pools.values()) + list(_versions.values())
+        _pools.clear()
+        _versions.clear()
+        _async_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_pool(database=None):
+    """Return the shared pool for `database` (default: configured path)."""
+    with _pools_lock:
+        database = database or _settings["database"]
+        pool = _pools.get(database)
+        if pool is None:
+            options = {k: v for k, v in _settings.items() if k != "database"}
+            pool = _pools[database] = SQLitePool(database, **options)
+        return pool
+
+
+def data_version(database=None):
+    """Return the current PRAGMA data_version of `database`."""
+    with _pools_lock:
+        database = database or _settings["database"]
+        version = _versions.get(database)
+        if version is None:
+            version = _versions[database] = DataVersion(database)
+    return version()
+
+
+async def close_async_pools():
+    """Close the idle connections of the running loop's async pools."""
+    with _pools_lock:
+        pools = list(_async_pools.pop(asyncio.get_running_loop(), {}).values())
+    for pool in pools:
+        await pool.close()
+
+
+def get_async_pool(database=None):
+    """Return the running event loop's async pool for `database`."""
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        database = database or _settings["database"]
+        pools = _async_pools.setdefault(loop, {})
+        pool = pools.get(database)
+        if pool is None:
+            options = {k: v for k, v in _settings.items() if k != "database"}
+            pool = pools[database] = AsyncSQLitePool(database, **options)
+        return pool
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Scratch-database fixture shared by the decorator test modules.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import db_pool
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Points the shared pool at a scratch database holding a `users`
+    table seeded with USERS, and silences the decorators' prints.
+    """
+
+    USERS = ((1, "old@example.com"),)
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE users "
+                         "(id INTEGER PRIMARY KEY, email TEXT)")
+            conn.executemany("INSERT INTO users VALUES (?, ?)", self.USERS)
+        conn.close()
+        db_pool.configure(database=self.path)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(db_pool.configure, database=db_pool.DEFAULT_DATABASE)
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def emails(self):
+        """Return id -> email as seen by a fresh connection."""
+        with sqlite3.connect(self.path) as conn:
+            emails = dict(conn.execute("SELECT id, email FROM users"))
+        conn.close()
+        return emails
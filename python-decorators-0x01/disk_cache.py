@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""Shared on-disk second tier for the cache_query decorator.
+
+Each worker process keeps its own in-memory QueryCache, so N workers
+each pay every cold miss and hold their own copy of each result.
+DiskCache is an SQLite-backed key/value store (WAL mode, one connection
+per thread) that every process on the host can open: results are
+pickled, expire after a TTL, are tagged with the tables they read for
+invalidation and may carry a data version like QueryCache entries.
+
+TieredCache puts a QueryCache (L1) in front of a DiskCache (L2): a miss
+in L1 looks in L2 before running the query, and results computed by one
+worker are stored in both, so the next worker's L1 miss is an L2 hit.
+Both tiers report their own hit rate. Lookups validated by a data
+version stay in L1: PRAGMA data_version values are per connection and
+mean nothing to another process.
+
+Invalidating a table bumps its stamp in the cache file. Lookups use the
+stamps of their query's tables as the entry version in both tiers, so
+an invalidation by any worker also retires the other workers' L1
+copies. Each worker re-reads a set of tables' stamps at most once per
+`stamp_interval` seconds, so L1 hits normally don't touch the file and
+another worker's invalidation takes effect here within that interval.
+
+Storing a result is best-effort: it waits at most `write_timeout` for
+the file's write lock and is skipped if another process holds it longer,
+so a busy cache never stalls the query path.
+
+Values are unpickled from the cache file, so it must only be writable by
+the application's own user.
+"""
+import asyncio
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+
+from query_cache import QueryCache, tables_in
+
+MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    version TEXT,
+    stored REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored);
+CREATE TABLE IF NOT EXISTS entry_tables (
+    tbl TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tbl, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS invalidations (
+    tbl TEXT PRIMARY KEY,
+    stamp INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _canonical(value):
+    """Process-independent text form of a cache key (sets sorted)."""
+    if isinstance(value, tuple):
+        return "(" + ",".join(_canonical(v) for v in value) + ")"
+    if isinstance(value, frozenset):
+        return "{" + ",".join(sorted(_canonical(v) for v in value)) + "}"
+    return f"{type(value).__name__}:{value!r}"
+
+
+def _encode_version(version):
+    """Text form of an entry version for the cache file."""
+    return None if version is None else _canonical(version)
+
+
+def key_digest(key):
+    """Stable digest of a QueryCache key, identical in every process."""
+    return hashlib.blake2b(_canonical(key).encode(),
+                           digest_size=20).hexdigest()
+
+
+class DiskCache:
+    """SQLite-backed result cache shared by processes on one host."""
+
+    def __init__(self, path="query_cache.db", ttl=300.0,
+                 max_entries=100_000, max_value_bytes=16 * 1024 * 1024,
+                 purge_every=256, timeout=5.0, write_timeout=0.05,
+                 clock=time.time):
+        """
+        Args:
+            path (str): Cache database file, shared by all workers.
+            ttl (float): Default seconds an entry stays valid; None
+                means entries never expire.
+            max_entries (int): Entries kept after a purge, newest first.
+            max_value_bytes (int): Larger pickled results are not stored.
+            purge_every (int): Purge expired/excess entries after this
+                many writes from this process.
+            timeout (float): Seconds invalidate() and clear() wait for
+                the write lock; these must not be skipped.
+            write_timeout (float): Seconds set() and purge() wait for
+                the write lock before giving up.
+            clock (callable): Wall-clock time source (shared across
+                processes), replaceable in tests.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_value_bytes = max_value_bytes
+        self.purge_every = purge_every
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.sets = self.errors = 0
+
+    def _conn(self):
+        """This thread's connection, created with the schema on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements, timeout=None):
+        """
+        Run (sql, params) pairs in one IMMEDIATE transaction.
+
+        Args:
+            timeout (float): Seconds to wait for the write lock instead
+                of `self.timeout`.
+
+        Returns:
+            bool: False if it failed (the error is counted).
+        """
+        try:
+            conn = self._conn()
+            if timeout is not None:
+                conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for sql, params in statements:
+                        conn.execute(sql, params)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                if timeout is not None:
+                    conn.execute(
+                        f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        except sqlite3.Error:
+            self._count(errors=1)
+            return False
+        return True
+
+    def stamps(self, tables):
+        """
+        Return the invalidation stamps of `tables` (sorted by name), or
+        None if the cache file can't be read.
+        """
+        tables = sorted({t.lower() for t in tables})
+        if not tables:
+            return ()
+        marks = ", ".join("?" * len(tables))
+        try:
+            found = dict(self._conn().execute(
+                f"SELECT tbl, stamp FROM invalidations WHERE tbl IN ({marks})",
+                tables))
+        except sqlite3.Error:
+            self._count(errors=1)
+            return None
+        return tuple(found.get(t, 0) for t in tables)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, n in increments.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key, version=None):
+        """
+        Return the cached value for `key`, or MISSING.
+
+        Expired entries and entries cached under another data version
+        are misses. Cache errors are counted and reported as misses.
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires, version FROM entries WHERE key = ?",
+                (key_digest(key),)).fetchone()
+        except sqlite3.Error:
+            row = None
+            self._count(errors=1)
+        if row is None:
+            self._count(misses=1)
+            return MISSING
+        blob, expires, stored_version = row
+        if (expires is not None and expires <= self._clock()) or \
+                (version is not None and
+                 stored_version != _encode_version(version)):
+            self._count(misses=1)
+            return MISSING
+        try:
+            value = pickle.loads(blob)
+        except Exception:  # written by incompatible code, or corrupt
+            self._count(misses=1, errors=1)
+            return MISSING
+        self._count(hits=1)
+        return value
+
+    def set(self, key, value, tables=(), ttl=QueryCache._MISSING,
+            version=None):
+        """
+        Store `value` under `key`.
+
+        Args:
+            tables (iterable): Tables the result was read from.
+            ttl (float): Overrides the default TTL for this entry.
+            version: Data version the value was read at.
+        """
+        ttl = self.ttl if ttl is QueryCache._MISSING else ttl
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            self._count(errors=1)
+            return
+        if len(blob) > self.max_value_bytes:
+            return
+        now = self._clock()
+        digest = key_digest(key)
+        statements = [
+            ("INSERT OR REPLACE INTO entries "
+             "(key, value, expires, version, stored) VALUES (?, ?, ?, ?, ?)",
+             (digest, blob, None if ttl is None else now + ttl,
+              _encode_version(version), now)),
+            ("DELETE FROM entry_tables WHERE key = ?", (digest,)),
+        ]
+        statements += [("INSERT INTO entry_tables (tbl, key) VALUES (?, ?)",
+                        (t, digest)) for t in {t.lower() for t in tables}]
+        if not self._write(statements, self.write_timeout):
+            return
+        with self._lock:
+            self.sets += 1
+            purge = self.purge_every and self.sets % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        """Delete expired entries and all but the newest `max_entries`."""
+        self._write([
+            ("DELETE FROM entries WHERE expires <= ?", (self._clock(),)),
+            ("DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+             "ORDER BY stored DESC LIMIT -1 OFFSET ?)", (self.max_entries,)),
+            ("DELETE FROM entry_tables WHERE key NOT IN "
+             "(SELECT key FROM entries)", ()),
+        ], self.write_timeout)
+
+    def invalidate(self, *tables):
+        """
+        Delete every entry whose query reads any of `tables` and bump the
+        tables' stamps, retiring other workers' L1 copies too.
+        """
+        tables = sorted({t.lower() for t in tables})
+        if not tables:
+            return
+        marks = ", ".join("?" * len(tables))
+        self._write([
+            (f"DELETE FROM entries WHERE key IN (SELECT key FROM "
+             f"entry_tables WHERE tbl IN ({marks}))", tables),
+            (f"DELETE FROM entry_tables WHERE tbl IN ({marks})", tables),
+        ] + [
+            ("INSERT INTO invalidations (tbl, stamp) VALUES (?, 1) "
+             "ON CONFLICT (tbl) DO UPDATE SET stamp = stamp + 1", (t,))
+            for t in tables
+        ])
+
+    def clear(self):
+        """Delete every entry (statistics are kept)."""
+        self._write([("DELETE FROM entries", ()),
+                     ("DELETE FROM entry_tables", ())])
+
+    def stats(self):
+        """Return this process's hit/miss counters and the entry count."""
+        try:
+            entries = self._conn().execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "sets": self.sets,
+                "errors": self.errors,
+                "entries": entries,
+            }
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache:
+    """QueryCache (L1) in front of a shared DiskCache (L2)."""
+
+    def __init__(self, l1, l2, stamp_interval=1.0, clock=time.monotonic):
+        """
+        Args:
+            l1 (QueryCache): This process's in-memory tier.
+            l2 (DiskCache): The tier shared with other processes.
+            stamp_interval (float): Seconds a read of the invalidation
+                stamps is reused; the longest another worker's
+                invalidation can go unnoticed in L1.
+            clock (callable): Time source, replaceable in tests.
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.stamp_interval = stamp_interval
+        self._clock = clock
+        self._stamps = {}  # sorted table names -> (stamps, read at)
+        self._stamps_lock = threading.Lock()
+
+    def _recent_stamps(self, tables):
+        """Return (names, stamps), stamps None if not read recently."""
+        names = tuple(sorted({t.lower() for t in tables}))
+        with self._stamps_lock:
+            entry = self._stamps.get(names)
+        if entry is not None and \
+                self._clock() - entry[1] < self.stamp_interval:
+            return names, entry[0]
+        return names, None
+
+    def _remember_stamps(self, names, stamps):
+        if stamps is not None:
+            with self._stamps_lock:
+                self._stamps[names] = (stamps, self._clock())
+        return stamps
+
+    def stamps(self, tables):
+        """The tables' invalidation stamps, re-read once per interval."""
+        names, stamps = self._recent_stamps(tables)
+        if stamps is None:
+            stamps = self._remember_stamps(names, self.l2.stamps(names))
+        return stamps
+
+    async def astamps(self, tables):
+        """stamps(), reading the cache file in a worker thread."""
+        names, stamps = self._recent_stamps(tables)
+        if stamps is None:
+            stamps = self._remember_stamps(
+                names, await asyncio.to_thread(self.l2.stamps, names))
+        return stamps
+
+    def get_or_compute(self, key, compute, tables=(),
+                       ttl=QueryCache._MISSING, version=None):
+        """
+        QueryCache.get_or_compute() across both tiers.
+
+        L1 misses are single-flighted by L1, so concurrent misses in one
+        process look in L2 (and run `compute`) once. Both tiers validate
+        entries against the tables' invalidation stamps (see stamps()).
+        With a `version` only L1 is used; if the stamps can't be read,
+        the query runs uncached.
+
+        Returns:
+            tuple: (value, computed) where `computed` is True only when
+            neither tier had the value and this caller ran `compute`.
+        """
+        if version is not None:
+            return self.l1.get_or_compute(key, compute, tables, ttl, version)
+        stamps = self.stamps(tables)
+        if stamps is None:
+            return compute(), True
+        computed = []
+
+        def fill():
+            value = self.l2.get(key, stamps)
+            if value is not MISSING:
+                return value
+            value = compute()
+            self.l2.set(key, value, tables, ttl, stamps)
+            computed.append(True)
+            return value
+
+        value, _ = self.l1.get_or_compute(key, fill, tables, ttl, stamps)
+        return value, bool(computed)
+
+    async def aget_or_compute(self, key, compute, tables=(),
+                              ttl=QueryCache._MISSING, version=None):
+        """Async get_or_compute(); L2 I/O runs in a worker thread."""
+        if version is not None:
+            return await self.l1.aget_or_compute(
+                key, compute, tables, ttl, version)
+        stamps = await self.astamps(tables)
+        if stamps is None:
+            return await compute(), True
+        computed = []
+
+        async def fill():
+            value = await asyncio.to_thread(self.l2.get, key, stamps)
+            if value is not MISSING:
+                return value
+            value = await compute()
+            await asyncio.to_thread(
+                self.l2.set, key, value, tables, ttl, stamps)
+            computed.append(True)
+            return value
+
+        value, _ = await self.l1.aget_or_compute(
+            key, fill, tables, ttl, stamps)
+        return value, bool(computed)
+
+    def invalidate(self, *tables):
+        """Evict entries reading any of `tables` from both tiers."""
+        self.l1.invalidate(*tables)
+        self.l2.invalidate(*tables)
+        with self._stamps_lock:
+            self._stamps.clear()
+
+    def invalidate_for(self, sql):
+        """Evict the entries affected by a write statement."""
+        self.invalidate(*tables_in(sql))
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        self.l1.clear()
+        self.l2.clear()
+
+    def stats(self):
+        """Per-tier statistics plus the combined hit rate."""
+        l1, l2 = self.l1.stats(), self.l2.stats()
+        lookups = l1["hits"] + l1["misses"]
+        return {
+            "l1": l1,
+            "l2": l2,
+            "hit_rate": ((l1["hits"] + l2["hits"]) / lookups
+                         if lookups else 0.0),
+        }
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Group commit for @transactional writes.
+
+On SQLite every COMMIT is an fsync, so committing each small update on
+its own caps write throughput at the disk's fsync rate. Two ways to share
+one commit between many writes are provided here:
+
+- batch(): everything the current thread runs inside the block uses one
+  pinned pool connection and one transaction, committed when the block
+  exits.
+- GroupCommitter: concurrent callers submit their work; the first one
+  becomes the leader, waits up to `window` seconds for more work to
+  arrive (less once as many callers as last time have queued), runs it
+  all on one connection and commits once.
+
+Either way each caller's work runs inside its own SAVEPOINT, so a caller
+that fails is rolled back to its savepoint without undoing the others.
+"""
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import db_pool
+
+_savepoint_ids = itertools.count(1)
+_local = threading.local()
+
+
+def current_batch():
+    """The connection of this thread's open batch(), or None."""
+    return getattr(_local, "conn", None)
+
+
+@contextmanager
+def savepoint(conn):
+    """Run a block inside a SAVEPOINT, rolling back only to it on error."""
+    name = f"sp_{next(_savepoint_ids)}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+
+@asynccontextmanager
+async def asavepoint(conn):
+    """savepoint() for aiosqlite connections."""
+    name = f"sp_{next(_savepoint_ids)}"
+    await conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        await conn.execute(f"ROLLBACK TO {name}")
+        await conn.execute(f"RELEASE {name}")
+        raise
+    await conn.execute(f"RELEASE {name}")
+
+
+@contextmanager
+def batch(pool=None):
+    """
+    Gather this thread's transactional calls into one transaction.
+
+    The transaction commits when the block exits normally and rolls back
+    entirely if an exception escapes it. A nested batch() joins the
+    outer one.
+    """
+    conn = current_batch()
+    if conn is not None:
+        yield conn
+        return
+    pool = db_pool.get_pool() if pool is None else pool
+    with pool.pinned() as conn:
+        _local.conn = conn
+        try:
+            conn.execute("BEGIN")
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _local.conn = None
+
+
+class _Request:
+    """One caller's work and, once its batch has committed, its outcome."""
+
+    __slots__ = ("work", "wake", "lead", "done", "result", "error")
+
+    def __init__(self, work):
+        self.work = work
+        self.wake = threading.Event()
+        self.lead = False
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class GroupCommitter:
+    """Leader-based group commit of work submitted from many threads."""
+
+    def __init__(self, window=0.002, max_batch=256, pool=None):
+        """
+        Args:
+            window (float): Longest the leader waits for more work
+                before committing. It stops waiting as soon as as many
+                callers are queued as took part in the previous batch,
+                so a steady set of writers pays no idle wait. Work that
+                arrives while a commit is in flight is batched
+                regardless, so 0 still groups writes under concurrency.
+            max_batch (int): Commit as soon as this much work is queued.
+            pool (SQLitePool): Pool to write through; defaults to
+                db_pool.get_pool() at commit time.
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self.pool = pool
+        self._pending = []
+        self._leading = False
+        self._expected = max_batch
+        self._cond = threading.Condition()
+        self.batches = self.requests = 0
+
+    def submit(self, work):
+        """
+        Run work(conn) in the next group transaction and return its result.
+
+        Blocks until that transaction has committed. If work raises, only
+        its own savepoint is rolled back and the exception is re-raised
+        here; if the COMMIT itself fails, every caller in the batch gets
+        that error. Inside batch(), or inside work already running in a
+        group transaction, the work joins that transaction instead.
+        """
+        conn = current_batch()
+        if conn is not None:
+            with savepoint(conn):
+                return work(conn)
+
+        request = _Request(work)
+        with self._cond:
+            self._pending.append(request)
+            if not self._leading:
+                self._leading = request.lead = True
+            elif len(self._pending) >= self._expected:
+                self._cond.notify()  # only the leader waits on it
+        if not request.lead:
+            request.wake.wait()
+        if not request.done:
+            # The leader is always the oldest pending request, so its
+            # own work is part of the batch it runs.
+            self._lead()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _lead(self):
+        """Collect a batch, run it, then hand leadership on."""
+        with self._cond:
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self._expected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            requests = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+        try:
+            self._run(requests)
+        finally:
+            with self._cond:
+                self.batches += 1
+                self.requests += len(requests)
+                # Callers seen around this batch; the next leader stops
+                # waiting once that many have queued again.
+                self._expected = min(self.max_batch,
+                                     len(requests) + len(self._pending))
+                for request in requests:
+                    request.done = True
+                if self._pending:
+                    successor = self._pending[0]
+                    successor.lead = True
+                    successor.wake.set()
+                else:
+                    self._leading = False
+            for request in requests:
+                request.wake.set()
+
+    def _run(self, requests):
+        """Run `requests` in one transaction, one savepoint each."""
+        pool = db_pool.get_pool() if self.pool is None else self.pool
+        try:
+            with pool.connection() as conn:
+                conn.execute("BEGIN")
+                # Work that submits more work joins this batch as a
+                # savepoint instead of queueing behind its own leader.
+                outer, _local.conn = current_batch(), conn
+                try:
+                    for request in requests:
+                        try:
+                            with savepoint(conn):
+                                request.result = request.work(conn)
+                        except Exception as e:
+                            request.error = e
+                finally:
+                    _local.conn = outer
+                conn.commit()
+        except BaseException as e:
+            # Nothing was committed: fail every request that hasn't
+            # already failed, and let KeyboardInterrupt and friends
+            # carry on up the leader's stack.
+            for request in requests:
+                if request.error is None:
+                    request.error = e
+            if not isinstance(e, Exception):
+                raise
+
+    def stats(self):
+        """Return the number of batches and the requests they carried."""
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch": (self.requests / self.batches
+                              if self.batches else 0.0),
+            }
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""Bounded LRU/TTL cache engine used by the cache_query decorator.
+
+Entries are keyed by the SQL string *and* its bind parameters, evicted
+least-recently-used once either `max_entries` or `max_bytes` is
+exceeded, expire after a per-entry TTL, and are tagged with the tables
+their query reads so that a write to a table can evict every cached
+query touching it. Each invalidation also bumps the tables' generation;
+a result whose computation started before the bump is returned to its
+callers but not cached, so a read racing with a write can't re-cache
+pre-write rows.
+
+get_or_compute() adds stampede protection: concurrent misses for the
+same key wait on a single in-flight computation ("single flight"), and
+with `stale_while_revalidate` set, an expired entry keeps being served
+for that many seconds while exactly one caller refreshes it.
+aget_or_compute() is the asyncio equivalent: waiters await a future
+instead of blocking the event loop.
+
+Entries can also carry a data version (e.g. SQLite's PRAGMA
+data_version): a lookup passing a different version treats the entry as
+invalidated, so results stay cached exactly as long as the database is
+unchanged.
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|JOIN|UPDATE|INTO)\s+["`\[]?(\w+)', re.IGNORECASE)
+
+
+def tables_in(sql):
+    """Return the lower-cased table names referenced by an SQL string."""
+    return frozenset(name.lower() for name in _TABLE_RE.findall(sql or ""))
+
+
+def freeze(value):
+    """Turn lists/dicts/sets into hashable equivalents for cache keys."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    return value
+
+
+def make_key(query, params=()):
+    """Cache key for a query and its bind parameters."""
+    return (query, freeze(params))
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a query result in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k) + estimate_size(v)
+    return size
+
+
+class _Entry:
+    """A cached value with its bookkeeping."""
+
+    __slots__ = ("value", "size", "expires", "tables", "version")
+
+    def __init__(self, value, size, expires, tables, version=None):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.tables = tables
+        self.version = version
+
+
+# Result of an async flight whose computing task was cancelled.
+_ABANDONED = object()
+
+
+class _Flight:
+    """One in-progress computation that other callers can wait on."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """Thread-safe LRU cache with TTL and table-based invalidation."""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttl=300.0, clock=time.monotonic, single_flight=True,
+                 stale_while_revalidate=0.0):
+        """
+        Args:
+            max_entries (int): Maximum number of cached results.
+            max_bytes (int): Maximum estimated size of all results.
+            ttl (float): Default seconds an entry stays valid; None
+                means entries never expire.
+            clock (callable): Time source, replaceable in tests.
+            single_flight (bool): Make concurrent get_or_compute() misses
+                for one key share a single computation.
+            stale_while_revalidate (float): Seconds after expiry during
+                which get_or_compute() still serves the old value while
+                one caller refreshes it.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.single_flight = single_flight
+        self.stale_while_revalidate = stale_while_revalidate
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._generations = {}  # table -> invalidation count
+        self._epoch = 0  # bumped by clear()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = 0
+        self.expirations = self.invalidations = 0
+        self.coalesced = self.stale_hits = self.discarded = 0
+
+    _MISSING = object()
+
+    def _lookup(self, key, version=None):
+        """
+        Return (entry, fresh) for `key`, or (None, False).
+
+        Entries past their stale window, or cached under a data version
+        other than `version`, are removed. The caller holds the lock.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        if version is not None and entry.version != version:
+            self._remove(key)
+            self.invalidations += 1
+            return None, False
+        if entry.expires is None or entry.expires > self._clock():
+            self._entries.move_to_end(key)
+            return entry, True
+        if entry.expires + self.stale_while_revalidate > self._clock():
+            return entry, False
+        self._remove(key)
+        self.expirations += 1
+        return None, False
+
+    def get(self, key, default=None, version=None):
+        """Return the cached value for `key`, or `default` on a miss."""
+        with self._lock:
+            entry, fresh = self._lookup(key, version)
+            if not fresh:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry.value
+
+    def get_or_compute(self, key, compute, tables=(), ttl=_MISSING,
+                       version=None):
+        """
+        Return the cached value for `key`, computing it on a miss.
+
+        Concurrent misses for the same key run `compute` once; the other
+        callers wait and receive its result (or its exception). A stale
+        entry within the stale_while_revalidate window is returned as-is
+        to everyone except the one caller that refreshes it.
+
+        Args:
+            compute (callable): Zero-argument function producing the value.
+            tables (iterable): Tables the result is read from.
+            ttl (float): Overrides the default TTL for the new entry.
+            version: Data version the value must have been cached
+                under; read it *before* computing so that a write racing
+                with `compute` leaves the entry stale.
+
+        Returns:
+            tuple: (value, computed) where `computed` is True when this
+            caller ran `compute` itself.
+        """
+        state, flight, generation = self._claim(
+            key, self._inflight, _Flight, version, tables)
+        if state == "cached":
+            return flight, False
+
+        if state == "wait":
+            flight.done.wait()
+            with self._lock:
+                self.coalesced += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, False
+
+        try:
+            value = compute()
+        except BaseException as e:
+            if flight is not None:
+                flight.error = e
+            raise
+        else:
+            self.set(key, value, tables, ttl, version, generation)
+            if flight is not None:
+                flight.value = value
+            return value, True
+        finally:
+            if flight is not None:
+                with self._lock:
+                    self._inflight.pop((key, version), None)
+                flight.done.set()
+
+    async def aget_or_compute(self, key, compute, tables=(), ttl=_MISSING,
+                              version=None):
+        """
+        Async version of get_or_compute().
+
+        If the task computing a value is cancelled, only that task is;
+        one of its waiters takes over the computation.
+
+        Args:
+            compute (callable): Zero-argument function returning an
+                awaitable that produces the value.
+
+        Returns:
+            tuple: (value, computed), as for get_or_compute().
+        """
+        while True:
+            state, flight, generation = self._claim(
+                key, self._async_inflight,
+                lambda: asyncio.get_running_loop().create_future(), version,
+                tables)
+            if state == "cached":
+                return flight, False
+            if state == "compute":
+                break
+            value = await asyncio.shield(flight)
+            if value is not _ABANDONED:
+                with self._lock:
+                    self.coalesced += 1
+                return value, False
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            if flight is not None:
+                flight.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            if flight is not None:
+                flight.set_exception(e)
+                flight.exception()  # retrieved here even without waiters
+            raise
+        else:
+            self.set(key, value, tables, ttl, version, generation)
+            if flight is not None:
+                flight.set_result(value)
+            return value, True
+        finally:
+            if flight is not None:
+                with self._lock:
+                    self._async_inflight.pop((key, version), None)
+
+    def _claim(self, key, inflight, new_flight, version=None, tables=()):
+        """
+        Decide what a get_or_compute caller does for `key`.
+
+        Flights are keyed by (key, version), so a caller that has seen a
+        newer data version never waits on a computation started before it.
+
+        Returns:
+            tuple: (state, payload, generation). ("cached", value, None)
+            for a fresh hit or a stale value someone else is refreshing;
+            ("wait", flight, None) to wait for another caller's
+            computation; ("compute", flight, generation) to compute the
+            value, where flight is None when single-flight is off and
+            generation is to be passed on to set().
+        """
+        with self._lock:
+            entry, fresh = self._lookup(key, version)
+            if fresh:
+                self.hits += 1
+                return "cached", entry.value, None
+            flight_key = (key, version)
+            flight = inflight.get(flight_key) if self.single_flight else None
+            if entry is not None:
+                self.stale_hits += 1
+                if flight is not None:
+                    return "cached", entry.value, None
+            else:
+                self.misses += 1
+            if flight is not None:
+                return "wait", flight, None
+            if self.single_flight:
+                flight = inflight[flight_key] = new_flight()
+            return "compute", flight, self._generation(tables)
+
+    def _generation(self, tables):
+        """Invalidation state of `tables`; the caller holds the lock."""
+        return self._epoch, tuple(self._generations.get(t, 0) for t in
+                                  sorted(t.lower() for t in tables))
+
+    def set(self, key, value, tables=(), ttl=_MISSING, version=None,
+            generation=None):
+        """
+        Cache `value` under `key`.
+
+        Args:
+            tables (iterable): Tables the result was read from.
+            ttl (float): Overrides the default TTL for this entry.
+            version: Data version the value was read at.
+            generation: Table generation captured before the value was
+                read; if any of `tables` has been invalidated since, the
+                value is not cached.
+        """
+        ttl = self.ttl if ttl is self._MISSING else ttl
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires = None if ttl is None else self._clock() + ttl
+        tables = frozenset(t.lower() for t in tables)
+        with self._lock:
+            if generation is not None and \
+                    generation != self._generation(tables):
+                self.discarded += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires, tables,
+                                        version)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or \
+                    self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *tables):
+        """Evict every entry whose query reads any of `tables`."""
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def invalidate_for(self, sql):
+        """Evict the entries affected by a write statement."""
+        self.invalidate(*tables_in(sql))
+
+    def clear(self):
+        """Drop every entry (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+            self._epoch += 1
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+                "stale_hits": self.stale_hits,
+                "discarded": self.discarded,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        """Remove `key`; the caller holds the lock."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Structured, low-overhead query instrumentation used by log_queries.
+
+Every instrumented call is reduced to a record of the query fingerprint
+(the SQL with literals replaced by `?`, so `WHERE id = 1` and
+`WHERE id = 2` share one), its duration, row count and caller.
+
+Records go to the `logging` module through a QueueHandler: the calling
+thread only enqueues them, and a QueueListener thread does the
+formatting and I/O. Slow and failed queries are always logged; fast
+ones are sampled one in `sample_every`. Independently of sampling, every
+call is counted in an in-memory latency histogram per fingerprint.
+"""
+import atexit
+import bisect
+import functools
+import itertools
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Normalise an SQL string so queries differing only in literals match.
+
+    String and numeric literals become `?`, IN lists collapse to
+    `IN (?)` and runs of whitespace become a single space.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (?)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def count_rows(result):
+    """Row count of a query result, or None if it can't be told cheaply."""
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    rowcount = getattr(result, "rowcount", -1)
+    return rowcount if isinstance(rowcount, int) and rowcount >= 0 else None
+
+
+def caller_of(depth=2):
+    """'file:line' of the frame `depth` levels above the caller."""
+    try:
+        frame = sys._getframe(depth)
+    except ValueError:
+        return None
+    return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+
+class LatencyHistogram:
+    """Log-scale latency histogram (100µs to ~100s buckets)."""
+
+    BOUNDS = tuple(0.0001 * 2 ** i for i in range(21))
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Count one observation."""
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.BOUNDS[i], self.max) \
+                    if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        """count, mean, p50, p95, p99 and max as a dict (seconds)."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class QueryLog:
+    """Non-blocking query logger with sampling and latency histograms."""
+
+    def __init__(self, logger="queries", sample_every=1, slow_threshold=0.1,
+                 handlers=None):
+        """
+        Args:
+            logger (str): Name of the logger records are sent to.
+            sample_every (int): Log one in this many fast queries;
+                0 logs none of them.
+            slow_threshold (float): Seconds from which a query counts as
+                slow and is always logged.
+            handlers (list): Handlers the queue listener writes to;
+                defaults to one StreamHandler on stdout.
+        """
+        if sample_every < 0:
+            raise ValueError("sample_every must be >= 0")
+        self.sample_every = sample_every
+        self.slow_threshold = slow_threshold
+        self.logger = logging.getLogger(logger)
+        self._handlers = handlers
+        self._listener = None
+        self._counter = itertools.count()
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.logged = self.sampled_out = 0
+
+    def start(self):
+        """Attach the QueueHandler and start the listener thread."""
+        with self._lock:
+            if self._listener is not None:
+                return
+            handlers = self._handlers
+            if handlers is None:
+                handler = logging.StreamHandler(sys.stdout)
+                handler.setFormatter(logging.Formatter(
+                    "[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+                handlers = [handler]
+            records = queue.SimpleQueue()
+            self._queue_handler = logging.handlers.QueueHandler(records)
+            self.logger.addHandler(self._queue_handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+            self._listener = logging.handlers.QueueListener(
+                records, *handlers, respect_handler_level=True)
+            self._listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        with self._lock:
+            listener, self._listener = self._listener, None
+            if listener is None:
+                return
+            self.logger.removeHandler(self._queue_handler)
+        listener.stop()
+
+    def record(self, query, duration, rows=None, caller=None, error=None):
+        """
+        Account for one executed query.
+
+        Args:
+            query (str): The SQL as executed.
+            duration (float): Seconds the call took.
+            rows (int): Rows returned or affected, if known.
+            caller (str): Call site, e.g. 'app.py:42'.
+            error (BaseException): The exception the call raised, if any.
+        """
+        fp = fingerprint(query)
+        slow = duration >= self.slow_threshold
+        with self._lock:
+            histogram = self._histograms.get(fp)
+            if histogram is None:
+                histogram = self._histograms[fp] = LatencyHistogram()
+            histogram.add(duration)
+            sampled = error is not None or slow or bool(
+                self.sample_every
+                and next(self._counter) % self.sample_every == 0)
+            if sampled:
+                self.logged += 1
+            else:
+                self.sampled_out += 1
+        if not sampled:
+            return
+        if self._listener is None:
+            self.start()
+        level = logging.WARNING if error is not None or slow else logging.INFO
+        self.logger.log(
+            level,
+            "query=%r duration_ms=%.3f rows=%s caller=%s%s",
+            fp, duration * 1000, rows, caller,
+            "" if error is None else f" error={type(error).__name__}",
+            extra={"fingerprint": fp, "duration": duration, "rows": rows,
+                   "caller": caller, "slow": slow,
+                   "error": None if error is None else repr(error)})
+
+    def histogram(self, query):
+        """The LatencyHistogram for `query` (raw SQL or fingerprint)."""
+        with self._lock:
+            return self._histograms.get(fingerprint(query))
+
+    def stats(self):
+        """Per-fingerprint latency summaries, slowest p95 first."""
+        with self._lock:
+            summaries = {fp: h.summary() for fp, h in self._histograms.items()}
+        return dict(sorted(summaries.items(),
+                           key=lambda item: -item[1]["p95"]))
+
+    def reset(self):
+        """Drop every histogram."""
+        with self._lock:
+            self._histograms.clear()
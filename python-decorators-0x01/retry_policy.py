@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Backoff, error classification and circuit breaking for retry_on_failure.
+
+Retries use exponential backoff with "full jitter": the n-th pause is
+drawn uniformly from [0, min(max_delay, delay * 2**n)], so workers that
+failed on the same lock spread out instead of retrying in lockstep.
+
+Only transient errors (SQLITE_BUSY / SQLITE_LOCKED, i.e. "database is
+locked" or "database table is locked") are retried; anything else is
+raised at once.
+
+A CircuitBreaker shared by the decorated functions watches the outcome
+of recent attempts. Once the failure rate over the window crosses the
+threshold it opens and calls fail fast with CircuitOpenError; after
+`reset_timeout` one probe call is let through, and its outcome closes
+or re-opens the circuit.
+"""
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from query_log import LatencyHistogram
+
+_TRANSIENT_CODES = frozenset((getattr(sqlite3, "SQLITE_BUSY", 5),
+                              getattr(sqlite3, "SQLITE_LOCKED", 6)))
+# SQLite's messages for those codes, for errors that carry no code.
+_TRANSIENT_MESSAGES = ("database is locked", "database table is locked")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through while the circuit is open."""
+
+
+def is_transient(error):
+    """True for lock/busy errors that are worth retrying."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    # sqlite_errorcode's low byte is the primary result code.
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in _TRANSIENT_CODES
+    # SQLITE_LOCKED may name the table: "database table is locked: users".
+    message = str(error).split(":", 1)[0]
+    return message in _TRANSIENT_MESSAGES
+
+
+def backoff_delays(delay, max_delay, rng=random):
+    """Yield full-jitter exponential backoff pauses, forever."""
+    attempt = 0
+    while True:
+        yield rng.uniform(0, min(max_delay, delay * 2 ** attempt))
+        attempt += 1
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a sliding window of attempts."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=0.5, window=20, min_calls=10,
+                 reset_timeout=30.0, clock=time.monotonic):
+        """
+        Args:
+            failure_threshold (float): Failure rate (0-1) that opens the
+                circuit.
+            window (int): Number of most recent attempts considered.
+            min_calls (int): Attempts needed before the rate is trusted.
+            reset_timeout (float): Seconds to stay open before probing.
+            clock (callable): Time source, replaceable in tests.
+        """
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = self._probe_at = None
+        self._lock = threading.Lock()
+        self.opened = self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go through now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = self._clock()
+            if self._state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+            elif now - self._probe_at < self.reset_timeout:
+                # A probe is already out; let another through only if
+                # it never reported back.
+                self.rejected += 1
+                return False
+            self._probe_at = now
+            return True
+
+    def record_success(self):
+        """Report that the database answered."""
+        with self._lock:
+            if self._state == self.OPEN:
+                return  # a call that started before the trip
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+
+    def record_failure(self):
+        """Report a transient failure."""
+        with self._lock:
+            if self._state == self.OPEN:
+                return
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(True)
+            if self._state == self.CLOSED and \
+                    len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) \
+                    >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        """Open the circuit; the caller holds the lock."""
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self.opened += 1
+
+    def reset(self):
+        """Close the circuit and forget recent outcomes."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._outcomes.clear()
+
+    def stats(self):
+        """Return the state, recent failure rate and trip counters."""
+        with self._lock:
+            outcomes = len(self._outcomes)
+            return {
+                "state": self._state,
+                "failure_rate": (sum(self._outcomes) / outcomes
+                                 if outcomes else 0.0),
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class RetryStats:
+    """Thread-safe attempt counters and end-to-end call latencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.calls = self.attempts = self.retries = 0
+        self.successes = self.gave_up = self.short_circuited = 0
+
+    def count(self, **increments):
+        """Add to the named counters, e.g. count(attempts=1)."""
+        with self._lock:
+            for name, n in increments.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def observe(self, seconds):
+        """Record the latency of one decorated call, retries included."""
+        with self._lock:
+            self.latency.add(seconds)
+
+    def stats(self):
+        """Return the counters and a latency summary as a dict."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "successes": self.successes,
+                "gave_up": self.gave_up,
+                "short_circuited": self.short_circuited,
+                "latency": self.latency.summary(),
+            }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async paths of the decorator suite.
+"""
+import asyncio
+import importlib
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import db_pool
+from db_test_case import DatabaseTestCase
+from query_cache import QueryCache
+
+log_queries = importlib.import_module("0-log_queries").log_queries
+with_db_connection = importlib.import_module(
+    "1-with_db_connection").with_db_connection
+transactional = importlib.import_module("2-transactional").transactional
+retry_on_failure = importlib.import_module(
+    "3-retry_on_failure").retry_on_failure
+cache_query = importlib.import_module("4-cache_query").cache_query
+
+
+class TestAsyncDecorators(DatabaseTestCase):
+    """Test cases for async def functions under the decorators."""
+
+    def run_async(self, coro):
+        """Run `coro` and close the loop's pooled connections."""
+        async def main():
+            try:
+                return await coro
+            finally:
+                await db_pool.close_async_pools()
+        return asyncio.run(main())
+
+    def email(self):
+        return self.emails()[1]
+
+    def test_transactional_commits_and_rolls_back(self):
+        """Async commit on success, async rollback on error."""
+        @with_db_connection
+        @transactional
+        async def update_email(conn, new_email, fail=False):
+            await conn.execute("UPDATE users SET email = ? WHERE id = 1",
+                               (new_email,))
+            if fail:
+                raise ValueError("boom")
+
+        self.assertTrue(asyncio.iscoroutinefunction(update_email))
+        self.run_async(update_email("new@example.com"))
+        self.assertEqual(self.email(), "new@example.com")
+        with self.assertRaises(ValueError):
+            self.run_async(update_email("bad@example.com", fail=True))
+        self.assertEqual(self.email(), "new@example.com")
+
+    def test_nested_transactions_use_savepoints(self):
+        """An inner async unit's failure doesn't undo the outer work."""
+        @transactional
+        async def set_email(conn, new_email):
+            await conn.execute("UPDATE users SET email = ? WHERE id = 1",
+                               (new_email,))
+            if new_email.startswith("bad"):
+                raise ValueError("boom")
+
+        @with_db_connection
+        @transactional
+        async def outer(conn):
+            await set_email(conn, "outer@example.com")
+            with self.assertRaises(ValueError):
+                await set_email(conn, "bad@example.com")
+
+        self.run_async(outer())
+        self.assertEqual(self.email(), "outer@example.com")
+
+    def test_retry_awaits_between_attempts(self):
+        """Async retries sleep with asyncio.sleep and retry the coroutine."""
+        attempts = []
+
+        @retry_on_failure(retries=3, delay=0.01)
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise sqlite3.OperationalError("database is locked")
+            return "ok"
+
+        with patch("asyncio.sleep", wraps=asyncio.sleep) as sleep:
+            self.assertEqual(self.run_async(flaky()), "ok")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(sleep.await_count, 2)
+
+    def test_cache_single_flight_across_tasks(self):
+        """Concurrent tasks missing one key run the query once."""
+        cache = QueryCache()
+        executions = []
+
+        @with_db_connection
+        @cache_query(cache=cache)
+        @log_queries
+        async def fetch(conn, query):
+            executions.append(query)
+            await asyncio.sleep(0.02)
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        async def many():
+            return await asyncio.gather(
+                *(fetch(query="SELECT * FROM users") for _ in range(10)))
+
+        results = self.run_async(many())
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(results, [[(1, "old@example.com")]] * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cache_query decorator and its QueryCache engine.
+"""
+import asyncio
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import db_pool
+from db_test_case import DatabaseTestCase
+from query_cache import QueryCache, tables_in
+
+cache_query_module = importlib.import_module("4-cache_query")
+cache_query = cache_query_module.cache_query
+with_db_connection = cache_query_module.with_db_connection
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for the QueryCache engine."""
+
+    def test_lru_eviction_by_entries(self):
+        """The least recently used entry is evicted first."""
+        cache = QueryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        """Entries are evicted once max_bytes is exceeded."""
+        cache = QueryCache(max_bytes=2000)
+        for i in range(10):
+            cache.set(i, [(i, "x" * 100)])
+        self.assertLessEqual(cache.stats()["bytes"], 2000)
+        self.assertIn(9, cache)
+        self.assertNotIn(0, cache)
+
+    def test_ttl_expiry(self):
+        """Entries expire after their TTL."""
+        clock = FakeClock()
+        cache = QueryCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=100)
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_table_invalidation(self):
+        """A write to a table evicts every query reading it."""
+        cache = QueryCache()
+        cache.set("q1", 1, tables_in("SELECT * FROM users"))
+        cache.set("q2", 2, tables_in(
+            "SELECT * FROM orders o JOIN users u ON u.id = o.user_id"))
+        cache.set("q3", 3, tables_in("SELECT * FROM orders"))
+        cache.invalidate_for("UPDATE users SET email = ? WHERE id = ?")
+        self.assertNotIn("q1", cache)
+        self.assertNotIn("q2", cache)
+        self.assertIn("q3", cache)
+
+    def test_invalidation_during_compute_is_not_lost(self):
+        """A result read before a write to its table isn't cached."""
+        cache = QueryCache()
+        tables = tables_in("SELECT * FROM users")
+
+        def compute():
+            cache.invalidate("users")  # a write lands mid-read
+            return "old rows"
+
+        self.assertEqual(cache.get_or_compute("k", compute, tables),
+                         ("old rows", True))
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["discarded"], 1)
+        cache.get_or_compute("k", lambda: "new rows", tables)
+        self.assertEqual(cache.get("k"), "new rows")
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Concurrency test cases for get_or_compute and @cache_query."""
+
+    def run_concurrently(self, threads, target):
+        """Start `threads` callers of target(i) at the same instant."""
+        barrier = threading.Barrier(threads)
+
+        def call(i):
+            barrier.wait()
+            return target(i)
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(call, range(threads)))
+
+    def test_one_execution_per_key_under_contention(self):
+        """50 threads missing 5 keys run exactly 5 queries."""
+        cache = QueryCache()
+        executions = {}
+        lock = threading.Lock()
+
+        @cache_query(cache=cache)
+        def fetch(conn, query, user_id):
+            with lock:
+                executions[user_id] = executions.get(user_id, 0) + 1
+            time.sleep(0.05)  # a slow query widens the race window
+            return [(user_id,)]
+
+        results = self.run_concurrently(50, lambda i: fetch(
+            None, query="SELECT * FROM users WHERE id = ?", user_id=i % 5))
+        self.assertEqual(executions, {k: 1 for k in range(5)})
+        self.assertEqual(results, [[(i % 5,)] for i in range(50)])
+        self.assertEqual(cache.stats()["coalesced"], 45)
+
+    def test_waiters_receive_the_error(self):
+        """If the single execution fails, every waiter sees the error."""
+        cache = QueryCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            raise RuntimeError("database is locked")
+
+        def call(_):
+            try:
+                cache.get_or_compute("k", compute)
+            except RuntimeError as e:
+                return str(e)
+
+        results = self.run_concurrently(10, call)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["database is locked"] * 10)
+        self.assertNotIn("k", cache)
+
+    def test_cancelled_computation_hands_over_to_a_waiter(self):
+        """Cancelling the computing task doesn't cancel its waiters."""
+        cache = QueryCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def main():
+            first = asyncio.create_task(cache.aget_or_compute("k", compute))
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(cache.aget_or_compute("k", compute))
+                       for _ in range(5)]
+            await asyncio.sleep(0.01)
+            first.cancel()
+            results = await asyncio.gather(*waiters)
+            self.assertTrue(first.cancelled())
+            return results
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(results), [(2, False)] * 4 + [(2, True)])
+        self.assertEqual(cache.get("k"), 2)
+
+    def test_stale_while_revalidate(self):
+        """Stale values are served while one caller refreshes."""
+        clock = FakeClock()
+        cache = QueryCache(ttl=10, stale_while_revalidate=30, clock=clock)
+        cache.set("k", "old")
+        clock.now = 15
+        refreshing = threading.Event()
+        release = threading.Event()
+
+        def refresh():
+            refreshing.set()
+            release.wait()
+            return "new"
+
+        refresher = threading.Thread(
+            target=cache.get_or_compute, args=("k", refresh))
+        refresher.start()
+        refreshing.wait()
+        self.assertEqual(cache.get_or_compute("k", refresh), ("old", False))
+        release.set()
+        refresher.join()
+        self.assertEqual(cache.get_or_compute("k", refresh), ("new", False))
+        clock.now = 100
+        self.assertEqual(cache.get_or_compute("k", lambda: "newer"),
+                         ("newer", True))
+
+
+class TestCacheQueryDecorator(unittest.TestCase):
+    """Test cases for @cache_query."""
+
+    def setUp(self):
+        self.cache = QueryCache()
+        self.calls = []
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query, params=()):
+            self.calls.append((query, params))
+            return [(len(self.calls),)]
+
+        self.fetch = fetch
+
+    def test_key_includes_parameters(self):
+        """Different bind parameters are cached separately."""
+        sql = "SELECT * FROM users WHERE id = ?"
+        first = self.fetch(None, query=sql, params=(1,))
+        self.assertEqual(self.fetch(None, query=sql, params=(1,)), first)
+        self.assertNotEqual(self.fetch(None, query=sql, params=(2,)), first)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+
+class TestDataVersionMode(DatabaseTestCase):
+    """Test cases for @cache_query(mode="data_version")."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = QueryCache(ttl=300)
+        self.executions = 0
+
+        @with_db_connection
+        @cache_query(cache=self.cache, mode="data_version")
+        def fetch(conn, query):
+            self.executions += 1
+            return conn.execute(query).fetchall()
+
+        self.fetch = fetch
+
+    def test_reads_stay_cached_between_writes(self):
+        """Without writes, repeated reads never touch the database."""
+        for _ in range(5):
+            self.fetch(query="SELECT email FROM users")
+        self.assertEqual(self.executions, 1)
+
+    def test_external_write_invalidates(self):
+        """A commit from an unrelated connection makes the entry stale."""
+        query = "SELECT email FROM users"
+        self.assertEqual(self.fetch(query=query), [("old@example.com",)])
+        with sqlite3.connect(self.path) as other:
+            other.execute("UPDATE users SET email = 'new@example.com'")
+        self.assertEqual(self.fetch(query=query), [("new@example.com",)])
+        self.assertEqual(self.fetch(query=query), [("new@example.com",)])
+        self.assertEqual(self.executions, 2)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_write_through_the_pool_invalidates(self):
+        """Commits made on pooled connections are seen as well."""
+        query = "SELECT email FROM users"
+        self.fetch(query=query)
+        with db_pool.get_pool().connection() as conn:
+            conn.execute("UPDATE users SET email = 'pool@example.com'")
+            conn.commit()
+        self.assertEqual(self.fetch(query=query), [("pool@example.com",)])
+
+    def test_version_follows_the_call_connection(self):
+        """Another database is cached and invalidated on its own."""
+        fd, other_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, other_path)
+        with sqlite3.connect(other_path) as other:
+            other.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                          "email TEXT)")
+            other.execute("INSERT INTO users VALUES (1, 'b@example.com')")
+        other.close()
+
+        @cache_query(cache=self.cache, mode="data_version")
+        def fetch_from(conn, query):
+            self.executions += 1
+            return conn.execute(query).fetchall()
+
+        def fetch_other(query):
+            with db_pool.get_pool(other_path).connection() as conn:
+                return fetch_from(conn, query)
+
+        query = "SELECT email FROM users"
+        self.assertEqual(self.fetch(query=query), [("old@example.com",)])
+        self.assertEqual(fetch_other(query), [("b@example.com",)])
+        with sqlite3.connect(other_path) as other:
+            other.execute("UPDATE users SET email = 'c@example.com'")
+        other.close()
+        self.assertEqual(fetch_other(query), [("c@example.com",)])
+        self.assertEqual(self.fetch(query=query), [("old@example.com",)])
+        self.assertEqual(self.executions, 3)
+
+    def test_async_version_follows_the_call_connection(self):
+        """Coroutines read the version of their aiosqlite connection."""
+        @with_db_connection
+        @cache_query(cache=self.cache, mode="data_version")
+        async def fetch(conn, query):
+            self.executions += 1
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        async def main():
+            query = "SELECT email FROM users"
+            first = await fetch(query=query)
+            await fetch(query=query)
+            with sqlite3.connect(self.path) as other:
+                other.execute("UPDATE users SET email = 'new@example.com'")
+            other.close()
+            second = await fetch(query=query)
+            await db_pool.close_async_pools()
+            return [tuple(row) for row in first + second]
+
+        self.assertEqual(asyncio.run(main()),
+                         [("old@example.com",), ("new@example.com",)])
+        self.assertEqual(self.executions, 2)
+
+    def test_in_memory_database_is_rejected(self):
+        """There is no file whose data_version could be watched."""
+        @cache_query(cache=self.cache, mode="data_version")
+        def fetch_from(conn, query):
+            return conn.execute(query).fetchall()
+
+        conn = sqlite3.connect(":memory:")
+        self.addCleanup(conn.close)
+        with self.assertRaisesRegex(ValueError, "file database"):
+            fetch_from(conn, "SELECT 1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared on-disk cache tier and TieredCache.
+"""
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from disk_cache import MISSING, DiskCache, TieredCache, key_digest
+from query_cache import QueryCache, make_key, tables_in
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DiskCacheTestCase(unittest.TestCase):
+    """Gives each test a fresh cache file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+        self.clock = FakeClock()
+
+    def disk(self):
+        cache = DiskCache(self.path, ttl=60, clock=self.clock)
+        self.addCleanup(cache.close)
+        return cache
+
+    def worker(self):
+        """A TieredCache as a separate worker process would build it."""
+        return TieredCache(QueryCache(), self.disk(), clock=self.clock)
+
+
+class TestDiskCache(DiskCacheTestCase):
+    """Test cases for DiskCache."""
+
+    def test_key_digest_is_stable_across_processes(self):
+        """Set ordering in keys doesn't depend on hash randomisation."""
+        key = make_key("SELECT * FROM users WHERE id IN (?)",
+                       ({"a", "b", "c"},))
+        code = ("from query_cache import make_key; "
+                "from disk_cache import key_digest; "
+                "print(key_digest(make_key("
+                "'SELECT * FROM users WHERE id IN (?)', ({'a','b','c'},))))")
+        digests = {key_digest(key)}
+        for seed in ("1", "2"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            digests.add(subprocess.run(
+                [sys.executable, "-c", code], env=env, check=True,
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip())
+        self.assertEqual(len(digests), 1)
+
+    def test_ttl_and_invalidation(self):
+        """Entries expire by TTL and are evicted by table."""
+        cache = self.disk()
+        cache.set("a", [(1,)], tables_in("SELECT * FROM users"))
+        cache.set("b", [(2,)], tables_in("SELECT * FROM orders"), ttl=600)
+        self.assertEqual(cache.get("a"), [(1,)])
+        cache.invalidate("users")
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.get("b"), [(2,)])
+        self.clock.now += 601
+        self.assertIs(cache.get("b"), MISSING)
+
+    def test_unpicklable_results_are_skipped(self):
+        """A result that can't be pickled is simply not stored."""
+        cache = self.disk()
+        cache.set("a", [lambda: None])
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.stats()["errors"], 1)
+
+    def test_writes_give_up_when_the_file_is_locked(self):
+        """A set() blocked by another writer is skipped, not waited on."""
+        cache = self.disk()
+        cache.get("a")  # create the schema
+        holder = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        cache.set("a", [(1,)])
+        self.assertLess(time.monotonic() - started, 1.0)
+        holder.execute("ROLLBACK")
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.stats()["errors"], 1)
+
+
+class TestTieredCache(DiskCacheTestCase):
+    """Test cases for TieredCache."""
+
+    def test_second_worker_hits_l2(self):
+        """A result computed by one worker is an L2 hit for the next."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [(1, "alice")]
+
+        first, second = self.worker(), self.worker()
+        self.assertEqual(first.get_or_compute("k", compute),
+                         ([(1, "alice")], True))
+        self.assertEqual(second.get_or_compute("k", compute),
+                         ([(1, "alice")], False))
+        self.assertEqual(second.get_or_compute("k", compute),
+                         ([(1, "alice")], False))
+        self.assertEqual(len(calls), 1)
+        stats = second.stats()
+        self.assertEqual((stats["l1"]["hits"], stats["l1"]["misses"]),
+                         (1, 1))
+        self.assertEqual((stats["l2"]["hits"], stats["l2"]["misses"]),
+                         (1, 0))
+        self.assertEqual(stats["hit_rate"], 1.0)
+
+    def test_invalidation_reaches_other_workers_l2(self):
+        """A write in one worker evicts the shared entry for all."""
+        first, second = self.worker(), self.worker()
+        sql = "SELECT * FROM users"
+        first.get_or_compute("k", lambda: "old", tables_in(sql))
+        first.invalidate_for("UPDATE users SET email = ?")
+        self.assertEqual(second.get_or_compute("k", lambda: "new"),
+                         ("new", True))
+
+    def test_invalidation_reaches_other_workers_l1(self):
+        """An invalidation retires entries already in another worker's L1."""
+        first, second = self.worker(), self.worker()
+        tables = tables_in("SELECT * FROM users")
+        first.get_or_compute("k", lambda: "old", tables)
+        self.assertEqual(second.get_or_compute("k", lambda: "x", tables),
+                         ("old", False))
+        self.assertEqual(second.get_or_compute("k", lambda: "x", tables),
+                         ("old", False))
+        first.invalidate("users")
+        self.assertEqual(second.get_or_compute("k", lambda: "x", tables),
+                         ("old", False))  # within stamp_interval
+        self.clock.now += second.stamp_interval
+        self.assertEqual(second.get_or_compute("k", lambda: "new", tables),
+                         ("new", True))
+        self.assertEqual(first.get_or_compute("k", lambda: "x", tables),
+                         ("new", False))
+
+    def test_l1_hits_reuse_recent_stamps(self):
+        """Within stamp_interval an L1 hit doesn't read the cache file."""
+        cache = self.worker()
+        tables = tables_in("SELECT * FROM users")
+        with patch.object(cache.l2, "stamps",
+                          wraps=cache.l2.stamps) as stamps:
+            for _ in range(5):
+                cache.get_or_compute("k", lambda: "v", tables)
+            self.assertEqual(stamps.call_count, 1)
+            self.clock.now += cache.stamp_interval
+            cache.get_or_compute("k", lambda: "v", tables)
+            self.assertEqual(stamps.call_count, 2)
+
+    def test_async_lookups_read_stamps_off_the_loop(self):
+        """aget_or_compute reads stamps in a worker thread."""
+        cache = self.worker()
+        threads = []
+
+        def stamps(tables):
+            threads.append(threading.get_ident())
+            return ()
+
+        async def compute():
+            return "v"
+
+        async def main():
+            threads.append(threading.get_ident())
+            return await cache.aget_or_compute("k", compute)
+
+        with patch.object(cache.l2, "stamps", side_effect=stamps):
+            self.assertEqual(asyncio.run(main()), ("v", True))
+        loop_thread, stamps_thread = threads
+        self.assertNotEqual(loop_thread, stamps_thread)
+
+    def test_versioned_lookups_stay_in_l1(self):
+        """Data versions are per process, so they never go to L2."""
+        first, second = self.worker(), self.worker()
+        first.get_or_compute("k", lambda: "v1", version=3)
+        self.assertEqual(second.get_or_compute("k", lambda: "v2",
+                                               version=3), ("v2", True))
+        self.assertEqual(first.stats()["l2"]["sets"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
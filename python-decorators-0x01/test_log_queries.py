@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the log_queries decorator and its QueryLog engine.
+"""
+import importlib
+import logging
+import threading
+import unittest
+
+from query_log import LatencyHistogram, QueryLog, fingerprint
+
+log_queries = importlib.import_module("0-log_queries").log_queries
+
+
+class ListHandler(logging.Handler):
+    """Collects emitted records and the threads they were emitted on."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.get_ident())
+
+
+class TestFingerprint(unittest.TestCase):
+    """Test cases for query fingerprinting."""
+
+    def test_literals_are_normalised(self):
+        """Queries differing only in literals share a fingerprint."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM users WHERE id = 1"),
+            fingerprint("SELECT *  FROM users\n WHERE id = 42"))
+        self.assertEqual(
+            fingerprint("SELECT * FROM users WHERE email = 'a''b@x.com'"),
+            "SELECT * FROM users WHERE email = ?")
+        self.assertEqual(
+            fingerprint("SELECT * FROM users WHERE id IN (1, 2, 3)"),
+            "SELECT * FROM users WHERE id IN (?)")
+
+    def test_identifiers_are_kept(self):
+        """Digits inside identifiers are not literals."""
+        self.assertEqual(fingerprint("SELECT col1 FROM t2 LIMIT 10"),
+                         "SELECT col1 FROM t2 LIMIT ?")
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test cases for LatencyHistogram."""
+
+    def test_percentiles(self):
+        """Percentiles fall in the right log-scale bucket."""
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.add(0.001)
+        for _ in range(10):
+            histogram.add(0.5)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertLessEqual(summary["p50"], 0.0016)
+        self.assertGreaterEqual(summary["p99"], 0.5)
+        self.assertEqual(summary["max"], 0.5)
+
+
+class TestQueryLog(unittest.TestCase):
+    """Test cases for QueryLog and @log_queries."""
+
+    def setUp(self):
+        self.handler = ListHandler()
+        self.log = QueryLog(logger=f"test.queries.{id(self)}",
+                            sample_every=10, slow_threshold=0.05,
+                            handlers=[self.handler])
+        self.addCleanup(self.log.stop)
+
+    def test_sampling_keeps_slow_and_failed_queries(self):
+        """Fast queries are sampled 1 in N; slow and failed ones never are."""
+        for i in range(100):
+            self.log.record(f"SELECT * FROM users WHERE id = {i}", 0.001)
+        self.log.record("SELECT * FROM users WHERE id = 7", 0.2)
+        self.log.record("SELECT * FROM users WHERE id = 8", 0.001,
+                        error=RuntimeError("boom"))
+        self.log.stop()
+        self.assertEqual(len(self.handler.records), 12)
+        self.assertEqual(self.log.sampled_out, 90)
+        self.assertEqual(
+            self.log.histogram("SELECT * FROM users WHERE id = 0").count, 102)
+
+    def test_counters_are_exact_under_threads(self):
+        """Concurrent callers never lose a logged/sampled_out count."""
+        def record():
+            for i in range(2000):
+                self.log.record(f"SELECT {i}", 0.001)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((self.log.logged, self.log.sampled_out),
+                         (1600, 14400))
+
+    def test_records_are_written_off_the_calling_thread(self):
+        """The QueueListener thread, not the caller, emits records."""
+        self.log.sample_every = 1
+        self.log.record("SELECT 1", 0.001, rows=1, caller="x.py:1")
+        self.log.stop()
+        self.assertNotIn(threading.get_ident(), self.handler.threads)
+        record = self.handler.records[0]
+        self.assertEqual((record.fingerprint, record.rows, record.caller),
+                         ("SELECT ?", 1, "x.py:1"))
+
+    def test_decorator_records_rows_and_caller(self):
+        """@log_queries times the call and counts the rows it returned."""
+        self.log.sample_every = 1
+
+        @log_queries(log=self.log)
+        def fetch(conn, query):
+            return [(1,), (2,)]
+
+        self.assertEqual(fetch(None, query="SELECT id FROM users"),
+                         [(1,), (2,)])
+        self.log.stop()
+        record = self.handler.records[0]
+        self.assertEqual(record.rows, 2)
+        self.assertIn("test_log_queries.py", record.caller)
+        self.assertEqual(
+            self.log.stats()["SELECT id FROM users"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Unit tests for retry_on_failure and its retry policy helpers.
+"""
+import importlib
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from retry_policy import (CircuitBreaker, CircuitOpenError, RetryStats,
+                          backoff_delays, is_transient)
+
+retry_on_failure = importlib.import_module(
+    "3-retry_on_failure").retry_on_failure
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for the backoff and error classification helpers."""
+
+    def test_only_lock_errors_are_transient(self):
+        """SQLITE_BUSY/SQLITE_LOCKED are retried, others are not."""
+        self.assertTrue(is_transient(LOCKED))
+        self.assertTrue(is_transient(
+            sqlite3.OperationalError("database table is locked: users")))
+        for message in ("no such table: users", "file is busy elsewhere",
+                        "column locked does not exist"):
+            self.assertFalse(is_transient(sqlite3.OperationalError(message)))
+        self.assertFalse(is_transient(sqlite3.IntegrityError("locked")))
+
+    def test_error_codes_win_over_messages(self):
+        """With a result code, only BUSY/LOCKED (and extended) count."""
+        def error(code, message="database is locked"):
+            e = sqlite3.OperationalError(message)
+            e.sqlite_errorcode = code
+            return e
+
+        self.assertTrue(is_transient(error(5, "anything")))
+        self.assertTrue(is_transient(error(6 | 1 << 8)))  # LOCKED_SHAREDCACHE
+        self.assertFalse(is_transient(error(1)))
+
+    def test_real_lock_error_is_transient(self):
+        """The error sqlite3 raises on a held write lock is retried."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "locked.db")
+        holder = sqlite3.connect(path, isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute("CREATE TABLE t (x)")
+        holder.execute("BEGIN IMMEDIATE")
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaises(sqlite3.OperationalError) as caught:
+            other.execute("INSERT INTO t VALUES (1)")
+        self.assertTrue(is_transient(caught.exception))
+
+    def test_full_jitter_bounds(self):
+        """Pauses stay within [0, min(max_delay, delay * 2**n)]."""
+        delays = backoff_delays(0.1, 1.0, rng=random.Random(7))
+        pauses = [next(delays) for _ in range(8)]
+        for n, pause in enumerate(pauses):
+            self.assertGreaterEqual(pause, 0)
+            self.assertLessEqual(pause, min(1.0, 0.1 * 2 ** n))
+        self.assertEqual(len(set(pauses)), 8)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=0.5, window=10,
+                                      min_calls=4, reset_timeout=5,
+                                      clock=self.clock)
+
+    def test_opens_at_threshold_and_probes_after_timeout(self):
+        """Open at the failure rate, then let a single probe through."""
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now = 6
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """A failing probe opens the circuit again."""
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.clock.now = 6
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.breaker.stats()["opened"], 2)
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test cases for the @retry_on_failure decorator."""
+
+    def setUp(self):
+        self.stats = RetryStats()
+        self.breaker = CircuitBreaker(min_calls=4, reset_timeout=60)
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def decorate(self, errors, **options):
+        """A function raising each of `errors` in turn, then returning."""
+        errors = list(errors)
+        calls = []
+
+        @retry_on_failure(delay=0.001, breaker=self.breaker,
+                          stats=self.stats, **options)
+        def query():
+            calls.append(1)
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+        return query, calls
+
+    def test_retries_transient_errors(self):
+        """Lock errors are retried and the attempts counted."""
+        query, calls = self.decorate([LOCKED, LOCKED], retries=3)
+        self.assertEqual(query(), "ok")
+        stats = self.stats.stats()
+        self.assertEqual((stats["attempts"], stats["retries"],
+                          stats["successes"]), (3, 2, 1))
+        self.assertEqual(stats["latency"]["count"], 1)
+
+    def test_non_transient_errors_are_not_retried(self):
+        """Anything but locked/busy is raised on the first attempt."""
+        error = sqlite3.OperationalError("no such table: users")
+        query, calls = self.decorate([error], retries=3)
+        with self.assertRaises(sqlite3.OperationalError):
+            query()
+        self.assertEqual(len(calls), 1)
+
+    def test_non_transient_errors_leave_the_breaker_alone(self):
+        """Constraint violations neither trip nor reset the breaker."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        violation = sqlite3.IntegrityError("UNIQUE constraint failed")
+        query, _ = self.decorate([violation] * 20, retries=3)
+        for _ in range(20):
+            with self.assertRaises(sqlite3.IntegrityError):
+                query()
+        self.assertEqual(self.breaker.stats()["failure_rate"], 1.0)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_deadline_stops_retrying(self):
+        """No retry is started once it would overrun the deadline."""
+        query, calls = self.decorate([LOCKED] * 10, retries=10,
+                                     max_delay=10, deadline=0.0)
+        with self.assertRaises(sqlite3.OperationalError):
+            query()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.stats.gave_up, 1)
+
+    def test_open_circuit_fails_fast(self):
+        """Once the breaker opens, calls raise without running."""
+        query, calls = self.decorate([LOCKED] * 10, retries=2)
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                query()
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            query()
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(self.stats.short_circuited, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
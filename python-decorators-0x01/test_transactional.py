@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the transactional decorator and group commit.
+"""
+import importlib
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from db_test_case import DatabaseTestCase
+from group_commit import GroupCommitter, batch
+
+transactional_module = importlib.import_module("2-transactional")
+transactional = transactional_module.transactional
+with_db_connection = transactional_module.with_db_connection
+
+
+def write_email(conn, user_id, new_email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                 (new_email, user_id))
+    if new_email is None:
+        raise ValueError("email required")
+
+
+set_email = with_db_connection(transactional(write_email))
+
+
+class Abort(BaseException):
+    """Stands in for KeyboardInterrupt/SystemExit raised by work."""
+
+
+class UsersTestCase(DatabaseTestCase):
+    """Scratch database with 10 users whose email is "old"."""
+
+    USERS = tuple((i, "old") for i in range(10))
+
+
+class TestBatch(UsersTestCase):
+    """Test cases for group_commit.batch()."""
+
+    def test_calls_share_one_transaction(self):
+        """Nothing is visible to other connections until the batch ends."""
+        with batch():
+            set_email(1, "a")
+            set_email(2, "b")
+            self.assertEqual(self.emails()[1], "old")
+        self.assertEqual(self.emails()[1], "a")
+        self.assertEqual(self.emails()[2], "b")
+
+    def test_failing_call_only_rolls_back_itself(self):
+        """A caller's error undoes its own savepoint, not the batch."""
+        with batch():
+            set_email(1, "a")
+            with self.assertRaises(ValueError):
+                set_email(2, None)
+            set_email(3, "c")
+        emails = self.emails()
+        self.assertEqual((emails[1], emails[2], emails[3]),
+                         ("a", "old", "c"))
+
+    def test_escaping_error_rolls_back_the_batch(self):
+        """An exception leaving the block discards the whole batch."""
+        with self.assertRaises(RuntimeError):
+            with batch():
+                set_email(1, "a")
+                raise RuntimeError("abort")
+        self.assertEqual(self.emails()[1], "old")
+
+
+class TestNestedTransactions(UsersTestCase):
+    """Test cases for @transactional functions calling each other."""
+
+    def setUp(self):
+        super().setUp()
+        self.inner = transactional(write_email)
+
+        @with_db_connection
+        @transactional
+        def outer(conn, emails, fail=False):
+            for user_id, email in emails.items():
+                try:
+                    self.inner(conn, user_id, email)
+                except ValueError:
+                    pass
+            self.in_transaction = conn.in_transaction
+            if fail:
+                raise RuntimeError("outer failed")
+
+        self.outer = outer
+
+    def test_only_the_outermost_scope_commits(self):
+        """Inner units release savepoints; the outer one commits them."""
+        self.outer({1: "a", 2: "b"})
+        self.assertTrue(self.in_transaction)
+        self.assertEqual((self.emails()[1], self.emails()[2]), ("a", "b"))
+
+    def test_inner_failure_rolls_back_to_its_savepoint(self):
+        """A failed inner unit leaves the outer transaction's work intact."""
+        self.outer({1: "a", 2: None, 3: "c"})
+        emails = self.emails()
+        self.assertEqual((emails[1], emails[2], emails[3]),
+                         ("a", "old", "c"))
+
+    def test_outer_failure_discards_released_inner_work(self):
+        """Inner RELEASEs are undone when the outer transaction fails."""
+        with self.assertRaises(RuntimeError):
+            self.outer({1: "a", 2: "b"}, fail=True)
+        self.assertEqual(set(self.emails().values()), {"old"})
+
+
+class TestGroupCommitter(UsersTestCase):
+    """Test cases for @transactional(group_commit=...)."""
+
+    def test_concurrent_calls_share_commits(self):
+        """Concurrent callers are committed together and isolated."""
+        committer = GroupCommitter(window=0.05)
+
+        update = transactional(write_email, group_commit=committer)
+        barrier = threading.Barrier(10)
+
+        def call(i):
+            barrier.wait()
+            try:
+                update(i, None if i == 5 else f"user{i}")
+            except ValueError:
+                return "failed"
+            return "ok"
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(call, range(10)))
+
+        self.assertEqual(results.count("failed"), 1)
+        emails = self.emails()
+        self.assertEqual(emails[5], "old")
+        self.assertEqual(emails[9], "user9")
+        stats = committer.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertLess(stats["batches"], 10)
+
+    def test_nested_group_committed_calls_join_the_batch(self):
+        """A grouped function calling another one doesn't deadlock."""
+        committer = GroupCommitter(window=0.01)
+        inner = transactional(write_email, group_commit=committer)
+
+        @transactional(group_commit=committer)
+        def outer(conn, user_id):
+            write_email(conn, user_id, "outer")
+            with self.assertRaises(ValueError):
+                inner(user_id + 1, None)
+            inner(user_id + 2, "inner")
+
+        thread = threading.Thread(target=outer, args=(1,), daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), "nested submit() deadlocked")
+        emails = self.emails()
+        self.assertEqual((emails[1], emails[2], emails[3]),
+                         ("outer", "old", "inner"))
+        self.assertEqual(committer.stats()["requests"], 1)
+
+    def test_base_exception_fails_the_whole_batch(self):
+        """Work raising a BaseException fails every caller in its batch."""
+        committer = GroupCommitter(window=1.0, max_batch=2)
+        barrier = threading.Barrier(2)
+
+        def work(user_id):
+            def run(conn):
+                write_email(conn, user_id, "new")
+                if user_id == 1:
+                    raise Abort()
+                return "ok"
+            return run
+
+        def call(user_id):
+            barrier.wait()
+            try:
+                return committer.submit(work(user_id))
+            except Abort:
+                return "aborted"
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(call, (1, 2)))
+
+        self.assertEqual(results, ["aborted", "aborted"])
+        self.assertEqual(set(self.emails().values()), {"old"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,26 +13,70 @@ Requirements:
 - Use the yield statement.
 - Use only one loop.
 - Return rows as dictionaries with user details.
+
+Connections are borrowed from the shared pool in pool.py.
+
+Passing `fetch_size` switches to an unbuffered (server-side) cursor that
+pulls `fetch_size` rows per round trip, so client memory stays flat no
+matter how large `user_data` is. Closing the generator early drops the
+connection, which cancels the rest of the query instead of draining it.
+
+stream_users_partitioned() reads user_id ranges concurrently, one pooled
+connection per range.
+
+Pass `row_factory` (e.g. rows.UserRow.from_dict) to get compact row
+objects instead of dicts.
 """
 
-import seed
+import pool
+from partitioned_scan import partitioned_rows
 
 
-def stream_users():
+def stream_users(fetch_size=None, row_factory=None):
     """
     Generator function that streams rows one by one from the user_data table.
+    Args:
+        fetch_size (int): Rows to pull per round trip from an unbuffered
+            server-side cursor. None keeps the driver's default cursor.
+        row_factory (callable): Converts each dict row before it is
+            yielded, e.g. rows.UserRow.from_dict.
     Yields:
-        dict: Each row containing user_id, name, email, and age.
+        dict: Each row containing user_id, name, email, and age (or
+        whatever row_factory returns).
     """
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data;")
+    with pool.get_pool().connection() as connection:
+        if fetch_size is None:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM user_data;")
+
+            for row in cursor:
+                yield row if row_factory is None else row_factory(row)
+        else:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            cursor.execute("SELECT * FROM user_data;")
 
-    for row in cursor:
-        yield row
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                if row_factory is not None:
+                    rows = map(row_factory, rows)
+                yield from rows
 
-    cursor.close()
-    connection.close()
+        cursor.close()
+
+
+def stream_users_partitioned(partitions=4, fetch_size=1000):
+    """
+    Stream every user by reading `partitions` user_id ranges concurrently.
+    Rows arrive in no particular order; user_id must be numeric.
+    Yields:
+        dict: Each row containing user_id, name, email, and age.
+    """
+    return partitioned_rows(pool.get_pool().connection, "user_data", ("*",),
+                            "user_id", partitions, fetch_size,
+                            placeholder="%s",
+                            cursor_kwargs={"dictionary": True})
 
 
 # Optional test for standalone execution
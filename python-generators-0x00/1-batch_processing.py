@@ -3,34 +3,213 @@
 Task 2: Batch Processing Users
 This script demonstrates fetching user data in batches
 and processing each batch to filter users over the age of 25.
+Connections to airbnb.db are borrowed from the shared SQLite pool in
+pool.py.
+
+Columnar mode (columnar=True) yields each batch as a dict of column
+sequences instead of a list of row tuples. Ages are packed into a NumPy
+array when NumPy is installed, or an array('i') otherwise, so the age
+filter runs as a single mask over the column.
+
+Filters are declarative (column, operator, value) specs. Specs that SQL
+can express are compiled into a parameterized WHERE clause so the
+database drops non-matching rows before they cross the wire; the rest
+(e.g. a callable operator) are applied in Python on each batch.
 """
 
-import sqlite3
+import operator
+from array import array
+from itertools import compress
+
+import pool
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; columnar mode falls back to array
+    np = None
+
+DB_PATH = "airbnb.db"
+
+COLUMNS = ("id", "name", "age", "country")
+
+# Bind parameter style of sqlite3, the driver behind DB_PATH's pool.
+PLACEHOLDER = "?"
+
+OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+}
+
+DEFAULT_FILTERS = (("age", ">", 25),)  # ✅ age > 25
 
-def stream_users_in_batches(batch_size=10):
+
+def compile_filters(filters, placeholder=PLACEHOLDER):
+    """
+    Split filter specs into a SQL WHERE clause and Python-side leftovers.
+
+    Args:
+        filters (iterable): (column, op, value) specs. `op` is one of
+            OPERATORS, or a callable `op(column_value, value)` which can
+            only be evaluated in Python.
+        placeholder (str): Bind parameter marker of the target driver.
+
+    Returns:
+        tuple: (where, params, leftover) where `where` is "" or a
+        "WHERE ..." clause using `placeholder`, `params` its bind values
+        and `leftover` the specs SQL could not express.
+
+    Raises:
+        ValueError: If a spec names an unknown column or operator.
+    """
+    clauses, params, leftover = [], [], []
+    for column, op, value in filters:
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column in filter: {column!r}")
+        if callable(op):
+            leftover.append((column, op, value))
+        elif op not in OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op!r}")
+        elif op == "in":
+            options = list(value)
+            if not options:
+                clauses.append("1 = 0")  # IN () matches nothing
+                continue
+            marks = ", ".join([placeholder] * len(options))
+            clauses.append(f"{column} IN ({marks})")
+            params.extend(options)
+        else:
+            clauses.append(f"{column} {op} {placeholder}")
+            params.append(value)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, tuple(params), leftover
+
+
+def _predicate(op):
+    """Return the Python callable for a filter operator."""
+    return op if callable(op) else OPERATORS[op]
+
+
+def filter_rows(rows, filters):
+    """Apply filter specs in Python to a list of row tuples."""
+    checks = [(COLUMNS.index(column), _predicate(op), value)
+              for column, op, value in filters]
+    return [row for row in rows
+            if all(check(row[i], value) for i, check, value in checks)]
+
+
+def column_mask(batch, filters):
+    """Build a boolean mask over a columnar batch for the filter specs."""
+    mask = None
+    for column, op, value in filters:
+        values = batch[column]
+        if np is not None and isinstance(values, np.ndarray) and \
+                op in OPERATORS and op != "in":
+            part = OPERATORS[op](values, value)
+        else:
+            check = _predicate(op)
+            part = [check(v, value) for v in values]
+            if np is not None:
+                part = np.fromiter(part, dtype=bool, count=len(values))
+        if mask is None:
+            mask = part
+        elif np is not None:
+            mask = mask & part
+        else:
+            mask = [a and b for a, b in zip(mask, part)]
+    return mask
+
+
+def to_columns(rows):
+    """
+    Transpose a list of (id, name, age, country) rows into columns.
+
+    Returns:
+        dict: Column name -> sequence; "age" is a NumPy int32 array or
+        an array('i').
+    """
+    ids, names, ages, countries = zip(*rows)
+    if np is not None:
+        ages = np.fromiter(ages, dtype=np.int32, count=len(rows))
+    else:
+        ages = array("i", ages)
+    return {"id": list(ids), "name": list(names), "age": ages,
+            "country": list(countries)}
+
+
+def filter_columns(batch, mask):
+    """Keep the rows of a columnar batch where `mask` is true."""
+    filtered = {}
+    for name, column in batch.items():
+        if np is not None and isinstance(column, np.ndarray):
+            filtered[name] = column[mask]
+        elif isinstance(column, array):
+            filtered[name] = array(column.typecode, compress(column, mask))
+        else:
+            filtered[name] = list(compress(column, mask))
+    return filtered
+
+
+def stream_users_in_batches(batch_size=10, columnar=False, where="",
+                            params=()):
     """
     Fetch rows from the 'user_data' table in batches using a generator.
+
+    Args:
+        batch_size (int): Rows per batch.
+        columnar (bool): Yield column dicts (see to_columns()) instead
+            of lists of row tuples.
+        where (str): Optional WHERE clause from compile_filters().
+        params (tuple): Bind values for `where`.
     """
-    conn = sqlite3.connect("airbnb.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, age, country FROM user_data")
+    with pool.get_pool(DB_PATH).connection() as conn:
+        cursor = conn.cursor()
+        query = "SELECT id, name, age, country FROM user_data"
+        if where:
+            query += " " + where
+        cursor.execute(query, params)
 
-    while True:
-        rows = cursor.fetchmany(batch_size)
-        if not rows:
-            break
-        yield rows  # ✅ Use yield instead of return
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield to_columns(rows) if columnar else rows  # ✅ Use yield instead of return
 
-    conn.close()
+        cursor.close()
 
 
-def batch_processing(batch_size=10):
+def batch_processing(batch_size=10, columnar=False, filters=DEFAULT_FILTERS,
+                     pushdown=True):
     """
-    Process each batch and filter users over the age of 25.
+    Process each batch and filter users (by default, over the age of 25).
+
+    Args:
+        batch_size (int): Rows per batch.
+        columnar (bool): Yield column dicts; Python-side filters are then
+            applied as a vectorized mask.
+        filters (iterable): (column, op, value) specs, see compile_filters().
+        pushdown (bool): Compile filters into SQL where possible. When
+            False every filter is applied in Python.
     """
-    for batch in stream_users_in_batches(batch_size):
-        filtered_users = [user for user in batch if user[2] > 25]  # ✅ age > 25
-        yield filtered_users  # ✅ use yield for generator output
+    if pushdown:
+        where, params, leftover = compile_filters(
+            filters, pool.get_pool(DB_PATH).placeholder)
+    else:
+        compile_filters(filters)  # validate specs only
+        where, params, leftover = "", (), list(filters)
+
+    for batch in stream_users_in_batches(batch_size, columnar, where, params):
+        if not leftover:
+            yield batch
+        elif columnar:
+            yield filter_columns(batch, column_mask(batch, leftover))
+        else:
+            filtered_users = filter_rows(batch, leftover)
+            yield filtered_users  # ✅ use yield for generator output
 
 
 if __name__ == "__main__":
@@ -10,21 +10,61 @@ to lazily load each page — only loading data when required.
 
 Functions:
 -----------
-- paginate_users(page_size, offset): fetches a page of users from MySQL.
-- lazy_pagination(page_size): lazily loads users page by page using yield.
+- paginate_users(page_size, offset): fetches a page of users from MySQL
+  with a prepared statement reused across pages on the same connection
+  (see pool.ConnectionPool.prepared() and statement_stats()).
+- paginate_users_after(page_size, last_user_id): fetches the page that
+  follows a given user_id (keyset / seek pagination).
+- lazy_pagination(page_size, keyset, cursor): lazily loads users page by
+  page using yield, optionally seeking by user_id and resuming from a
+  signed cursor token.
+- prefetched_pagination(page_size, depth, ...): lazy_pagination with a
+  background thread keeping up to `depth` pages fetched ahead, so page
+  round trips overlap with the consumer's processing.
 
 Requirements:
 --------------
 - Must use only one loop.
 - Must use the yield generator.
-- Must import seed.py for database connection.
+- Must import seed.py for database connection (pooled through pool.py,
+  so consecutive pages reuse the same connection).
 
 Author: Neuron Stars
 Course: ALX Backend - Python
 Project: python-generators-0x00
 """
 
-import seed
+import base64
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+
+import pool
+
+PAGE_SQL = "SELECT * FROM user_data LIMIT %s OFFSET %s;"
+FIRST_PAGE_AFTER_SQL = "SELECT * FROM user_data ORDER BY user_id LIMIT %s;"
+PAGE_AFTER_SQL = ("SELECT * FROM user_data WHERE user_id > %s "
+                  "ORDER BY user_id LIMIT %s;")
+
+# Key signing cursor tokens. Set PAGINATION_CURSOR_SECRET so that tokens
+# stay valid across processes and restarts; otherwise they only verify in
+# the process that issued them.
+CURSOR_SECRET = (os.environ.get("PAGINATION_CURSOR_SECRET", "").encode()
+                 or os.urandom(32))
+
+
+def _fetch_dicts(cursor):
+    """
+    Fetch the remaining rows of a tuple cursor as dicts.
+
+    The paginators ask pool.prepared() for plain tuple cursors, because
+    mysql-connector has no prepared cursor that returns dictionaries.
+    """
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
 
 
 def paginate_users(page_size, offset):
@@ -38,34 +78,229 @@ def paginate_users(page_size, offset):
     Returns:
         list[dict]: List of user records.
     """
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset};")
-    rows = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    db_pool = pool.get_pool()
+    with db_pool.connection() as connection:
+        cursor = db_pool.prepared(connection, PAGE_SQL)
+        cursor.execute(PAGE_SQL, (int(page_size), int(offset)))
+        rows = _fetch_dicts(cursor)
     return rows
 
 
-def lazy_pagination(page_size):
+def paginate_users_after(page_size, last_user_id=None):
+    """
+    Fetch the page of users that follows `last_user_id`.
+
+    Unlike OFFSET pagination, the database seeks straight to the first
+    matching key on the primary-key index, so every page costs the same
+    no matter how deep into the table it is.
+
+    Args:
+        page_size (int): Number of users to fetch per page.
+        last_user_id: user_id of the last row already seen, or None
+            to start from the beginning of the table.
+
+    Returns:
+        list[dict]: List of user records ordered by user_id.
+    """
+    if last_user_id is None:
+        sql, params = FIRST_PAGE_AFTER_SQL, (int(page_size),)
+    else:
+        sql, params = PAGE_AFTER_SQL, (last_user_id, int(page_size))
+    db_pool = pool.get_pool()
+    with db_pool.connection() as connection:
+        cursor = db_pool.prepared(connection, sql)
+        cursor.execute(sql, params)
+        rows = _fetch_dicts(cursor)
+    return rows
+
+
+def _sign(payload):
+    """HMAC of an encoded cursor payload, URL-safe base64."""
+    digest = hmac.new(CURSOR_SECRET, payload, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest)
+
+
+def encode_cursor(last_user_id):
+    """
+    Encode a user_id into an opaque, URL-safe, signed cursor token.
+
+    Args:
+        last_user_id (int | str): user_id of the last row already
+            consumed.
+
+    Returns:
+        str: Token that can be passed back to lazy_pagination().
+    """
+    raw = json.dumps({"after": last_user_id}).encode("utf-8")
+    payload = base64.urlsafe_b64encode(raw)
+    return (payload + b"." + _sign(payload)).decode("ascii")
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token produced by encode_cursor().
+
+    Args:
+        token (str): Cursor token.
+
+    Returns:
+        The user_id the token points after.
+
+    Raises:
+        ValueError: If the token is malformed or its signature doesn't
+            match (it was edited, or issued under another secret).
+    """
+    try:
+        payload, signature = token.encode("ascii").split(b".")
+    except (AttributeError, UnicodeEncodeError, ValueError) as e:
+        raise ValueError(f"Malformed pagination cursor: {token!r}") from e
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError(f"Pagination cursor failed verification: {token!r}")
+    try:
+        after = json.loads(base64.urlsafe_b64decode(payload))["after"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed pagination cursor: {token!r}") from e
+    if isinstance(after, bool) or not isinstance(after, (int, str)):
+        raise ValueError(f"Malformed pagination cursor: {token!r}")
+    return after
+
+
+def next_cursor(page):
+    """
+    Return the cursor token that resumes right after `page`.
+
+    Args:
+        page (list[dict]): A page yielded by lazy_pagination().
+
+    Returns:
+        str | None: Cursor token, or None for an empty page.
+    """
+    if not page:
+        return None
+    return encode_cursor(page[-1]["user_id"])
+
+
+def lazy_pagination(page_size, keyset=False, cursor=None, row_factory=None):
     """
     Generator function that lazily loads pages of users.
 
     Args:
         page_size (int): Number of users per page.
+        keyset (bool): Seek by user_id instead of using OFFSET.
+        cursor (str): Token from next_cursor() to resume after; implies
+            keyset pagination.
+        row_factory (callable): Converts each dict row, e.g.
+            rows.UserRow.from_dict for compact rows.
 
     Yields:
         list[dict]: One page of user data per iteration.
     """
+    keyset = keyset or cursor is not None
+    last_user_id = decode_cursor(cursor) if cursor is not None else None
     offset = 0
     while True:
-        page = paginate_users(page_size, offset)
+        if keyset:
+            page = paginate_users_after(page_size, last_user_id)
+        else:
+            page = paginate_users(page_size, offset)
         if not page:
             break
+        last_user_id = page[-1]["user_id"]
+        if row_factory is not None:
+            page = [row_factory(row) for row in page]
         yield page
         offset += page_size
 
 
+_END = object()
+
+
+class _Failure:
+    """An error raised by read_ahead()'s source, on its way to the consumer."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_ahead(iterable, depth=2):
+    """
+    Iterate `iterable` from a background thread, `depth` items ahead.
+
+    The producer thread stops (and closes `iterable`) as soon as this
+    generator is closed or garbage-collected; errors it hits are raised
+    in the consumer.
+
+    Args:
+        iterable: Source of items, e.g. lazy_pagination(...).
+        depth (int): Maximum number of items buffered ahead.
+
+    Yields:
+        The items of `iterable`, in order.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put(item):
+                    break
+            else:
+                put(_END)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True,
+                                name="lazy-pagination-read-ahead")
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def prefetched_pagination(page_size, depth=2, keyset=False, cursor=None,
+                          row_factory=None):
+    """
+    lazy_pagination() with up to `depth` pages fetched ahead in a thread.
+
+    Args:
+        page_size (int): Number of users per page.
+        depth (int): Pages kept in flight ahead of the consumer.
+        keyset (bool): Seek by user_id instead of using OFFSET.
+        cursor (str): Token from next_cursor() to resume after.
+        row_factory (callable): See lazy_pagination().
+
+    Yields:
+        list[dict]: One page of user data per iteration.
+    """
+    return read_ahead(lazy_pagination(page_size, keyset, cursor, row_factory),
+                      depth)
+
+
 if __name__ == "__main__":
     # Demo: print first few users from lazy pagination
     try:
@@ -2,20 +2,33 @@
 """
 Task 4: Stream User Ages
 Compute the average user age without using SQL's AVG() function.
+compute_age_statistics() computes every statistic from aggregates.py
+in the same single pass. The *_partitioned variants split the id range
+into chunks scanned in parallel, each on its own connection.
 """
 
 import sqlite3
+from functools import partial
 
-def stream_user_ages():
+from aggregates import aggregate
+from partitioned_scan import (partitioned_aggregate, partitioned_rows,
+                              sqlite_connection)
+
+DB_PATH = "airbnb.db"
+
+def stream_user_ages(fetch_size=10):
     """
     Generator that yields user ages one by one from the user_data table.
+
+    Args:
+        fetch_size (int): Rows pulled from the cursor per round trip.
     """
-    conn = sqlite3.connect("airbnb.db")
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("SELECT age FROM user_data")  # ✅ No AVG() used
 
     while True:
-        rows = cursor.fetchmany(10)
+        rows = cursor.fetchmany(fetch_size)
         if not rows:
             break
         for (age,) in rows:
@@ -42,6 +55,42 @@ def compute_average_age():
     return average_age
 
 
+def compute_age_statistics(fetch_size=1000, quantiles=(0.5, 0.9, 0.99)):
+    """
+    Computes count, sum, mean, variance, min/max, approximate quantiles
+    and approximate distinct count of ages in one pass over the table.
+
+    Returns:
+        dict: See aggregates.StreamAggregator.result().
+    """
+    return aggregate(stream_user_ages(fetch_size), quantiles)
+
+
+def stream_user_ages_partitioned(partitions=4, fetch_size=1000):
+    """
+    Generator that yields every age, reading id ranges concurrently.
+    Ages arrive in no particular order.
+    """
+    for (age,) in partitioned_rows(partial(sqlite_connection, DB_PATH),
+                                   "user_data", ("age",), "id",
+                                   partitions, fetch_size):
+        yield age
+
+
+def compute_average_age_partitioned(partitions=4, fetch_size=1000,
+                                    processes=True):
+    """
+    Computes the average age by merging per-partition partial aggregates
+    computed in worker processes (or threads with processes=False).
+    """
+    stats = partitioned_aggregate(partial(sqlite_connection, DB_PATH),
+                                  "user_data", "age", "id", partitions,
+                                  fetch_size, processes=processes)
+    if stats.moments.count == 0:
+        return 0
+    return stats.moments.mean
+
+
 if __name__ == "__main__":
     avg_age = compute_average_age()
     print(f"The average user age is: {avg_age:.2f}")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Streaming aggregates
+====================
+
+Single-pass, constant-memory statistics over a stream of numbers, such
+as the ages produced by `4-stream_ages.py::stream_user_ages`.
+
+Classes:
+--------
+- Moments: count, sum, mean, variance (Welford), min and max.
+- P2Quantile: approximate quantile with the P-square algorithm
+  (Jain & Chlamtac), five markers per quantile.
+- HyperLogLog: approximate distinct count in 2**precision bytes.
+- StreamAggregator: all of the above fed from one pass.
+
+Moments and HyperLogLog can be merged, so partial results computed over
+disjoint parts of a table combine into the result for the whole table
+(see partitioned_scan.py).
+"""
+
+import math
+from hashlib import blake2b
+
+
+class Moments:
+    """Running count, sum, mean, variance, min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, x):
+        """Add one value (Welford's online update)."""
+        self.count += 1
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        """Fold another Moments into this one (Chan et al.)."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self, ddof=0):
+        """Population variance (ddof=0) or sample variance (ddof=1)."""
+        if self.count <= ddof:
+            return None
+        return self.m2 / (self.count - ddof)
+
+
+class P2Quantile:
+    """Approximate p-quantile of a stream using five markers."""
+
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError("p must be between 0 and 1")
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0, p / 2, p, (1 + p) / 2, 1)
+
+    def update(self, x):
+        """Add one value."""
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                p = self.p
+                self._heights = sorted(self._initial)
+                self._positions = [0, 1, 2, 3, 4]
+                self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+                self._initial = None
+            return
+
+        q, n = self._heights, self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or \
+                    (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        """Piecewise-parabolic prediction of marker i moved by d."""
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        """Current estimate, or None if no values were seen."""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[round(self.p * (len(ordered) - 1))]
+
+
+class HyperLogLog:
+    """Approximate distinct counter."""
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def update(self, x):
+        """Add one value."""
+        h = int.from_bytes(
+            blake2b(repr(x).encode("utf-8"), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Fold another HyperLogLog of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(
+            max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class StreamAggregator:
+    """Moments, quantiles and distinct count computed in one pass."""
+
+    def __init__(self, quantiles=(0.5, 0.9, 0.99), hll_precision=12):
+        self.moments = Moments()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.distinct = HyperLogLog(hll_precision)
+
+    def update(self, x):
+        """Add one value to every statistic."""
+        self.moments.update(x)
+        for sketch in self.quantiles.values():
+            sketch.update(x)
+        self.distinct.update(x)
+
+    def merge(self, other):
+        """
+        Fold another StreamAggregator into this one.
+
+        Raises:
+            ValueError: If either side tracks quantiles; P-square sketches
+                cannot be merged.
+        """
+        if self.quantiles or other.quantiles:
+            raise ValueError("Quantile sketches cannot be merged; "
+                             "use quantiles=() for partial aggregates")
+        self.moments.merge(other.moments)
+        self.distinct.merge(other.distinct)
+        return self
+
+    def consume(self, values):
+        """Add every value of an iterable; returns self."""
+        for x in values:
+            self.update(x)
+        return self
+
+    def result(self):
+        """Return the statistics as a dict."""
+        m = self.moments
+        return {
+            "count": m.count,
+            "sum": m.total,
+            "mean": m.mean if m.count else None,
+            "variance": m.variance(),
+            "stddev": math.sqrt(m.variance()) if m.count else None,
+            "min": m.min,
+            "max": m.max,
+            "quantiles": {p: s.value() for p, s in self.quantiles.items()},
+            "distinct": self.distinct.count(),
+        }
+
+
+def aggregate(values, quantiles=(0.5, 0.9, 0.99), hll_precision=12):
+    """Compute every StreamAggregator statistic over `values` in one pass."""
+    return StreamAggregator(quantiles, hll_precision).consume(values).result()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Async generator versions of the python-generators-0x00 streamers
+================================================================
+
+`async def` counterparts of stream_users, lazy_pagination and
+stream_user_ages built on aiosqlite, for asyncio services where the
+blocking generators would stall the event loop.
+
+Functions:
+-----------
+- astream_users(db_path, fetch_size): yields user rows as dicts.
+- alazy_pagination(page_size, db_path, keyset, prefetch, key): yields
+  pages; with prefetch=True the next page is already being fetched
+  while the consumer works on the current one. Keyset mode seeks by
+  user_data's primary key column unless `key` names another one.
+- astream_user_ages(db_path, fetch_size): yields ages one by one.
+
+Backpressure: rows are only fetched when the consumer asks for them
+(at most one prefetched page for alazy_pagination), so a slow consumer
+never causes unbounded buffering.
+"""
+
+import asyncio
+
+import aiosqlite
+
+DB_PATH = "airbnb.db"
+
+
+def _dict_row(cursor, row):
+    """Row factory returning rows as dictionaries."""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+async def astream_users(db_path=DB_PATH, fetch_size=100):
+    """
+    Async generator that streams rows one by one from user_data.
+
+    Yields:
+        dict: Each row containing user_id, name, email, and age.
+    """
+    async with aiosqlite.connect(db_path) as db:
+        db.row_factory = _dict_row
+        async with db.execute("SELECT * FROM user_data") as cursor:
+            while True:
+                rows = await cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+
+async def _key_column(db, key=None):
+    """
+    Return the column keyset pagination seeks by: `key` once checked to
+    be a user_data column, or else the table's primary key.
+
+    Raises:
+        ValueError: If `key` isn't a column, or no key is given and the
+            table has no single-column primary key.
+    """
+    async with db.execute("PRAGMA table_info(user_data)") as cursor:
+        columns = await cursor.fetchall()
+    if key is not None:
+        if key not in {column["name"] for column in columns}:
+            raise ValueError(f"Unknown key column: {key!r}")
+        return key
+    keys = [column["name"] for column in columns if column["pk"]]
+    if len(keys) != 1:
+        raise ValueError("user_data needs a single-column primary key "
+                         "for keyset pagination; pass key=")
+    return keys[0]
+
+
+async def _fetch_page(db, page_size, offset, key, last_key):
+    """Fetch one page by OFFSET (key is None) or by seeking past last_key."""
+    if key is None:
+        sql = "SELECT * FROM user_data LIMIT ? OFFSET ?"
+        params = (page_size, offset)
+    elif last_key is None:
+        sql = f"SELECT * FROM user_data ORDER BY {key} LIMIT ?"
+        params = (page_size,)
+    else:
+        sql = (f"SELECT * FROM user_data WHERE {key} > ? "
+               f"ORDER BY {key} LIMIT ?")
+        params = (last_key, page_size)
+    async with db.execute(sql, params) as cursor:
+        return await cursor.fetchall()
+
+
+async def alazy_pagination(page_size, db_path=DB_PATH, keyset=False,
+                           prefetch=True, key=None):
+    """
+    Async generator that lazily loads pages of users.
+
+    Args:
+        page_size (int): Number of users per page.
+        db_path (str): SQLite database holding user_data.
+        keyset (bool): Seek by the key column instead of using OFFSET.
+        prefetch (bool): Fetch page N+1 while page N is being consumed.
+        key (str): Column keyset mode seeks by; defaults to the table's
+            primary key (user_id for the MySQL schema, id in airbnb.db).
+
+    Yields:
+        list[dict]: One page of user data per iteration.
+    """
+    async with aiosqlite.connect(db_path) as db:
+        db.row_factory = _dict_row
+        key = await _key_column(db, key) if keyset else None
+        offset, last_key = 0, None
+        pending = asyncio.ensure_future(
+            _fetch_page(db, page_size, offset, key, last_key))
+        try:
+            while True:
+                page = await pending
+                pending = None
+                if not page:
+                    break
+                offset += page_size
+                if key is not None:
+                    last_key = page[-1][key]
+                if prefetch:
+                    pending = asyncio.ensure_future(_fetch_page(
+                        db, page_size, offset, key, last_key))
+                yield page
+                if pending is None:
+                    pending = asyncio.ensure_future(_fetch_page(
+                        db, page_size, offset, key, last_key))
+        finally:
+            if pending is not None:
+                pending.cancel()
+                try:
+                    await pending
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+
+async def astream_user_ages(db_path=DB_PATH, fetch_size=10):
+    """
+    Async generator that yields user ages one by one from user_data.
+    """
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT age FROM user_data") as cursor:
+            while True:
+                rows = await cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for (age,) in rows:
+                    yield age
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync vs async pagination under concurrent consumers
+==============================================================
+
+Runs N concurrent asyncio consumers that each page through `user_data`
+and spend `--work-ms` per page "processing" it (an asyncio.sleep).
+
+- sync:  each consumer drives a blocking sqlite3 OFFSET paginator
+         (the shape of lazy_pagination) inside its coroutine, so every
+         page fetch stalls the event loop for all consumers.
+- async: each consumer uses async_streams.alazy_pagination, with and
+         without prefetching the next page.
+
+Reports total rows/sec for each variant.
+
+Usage:
+    python3 bench_async_streams.py [--rows 50000] [--consumers 8]
+                                   [--page-size 500] [--work-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from async_streams import alazy_pagination
+
+
+def build_database(path, rows):
+    """Create user_data with `rows` rows in the SQLite file at `path`."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        DROP TABLE IF EXISTS user_data;
+        CREATE TABLE user_data (
+            user_id INTEGER PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            age INTEGER
+        );
+    ''')
+    conn.execute('''
+        WITH RECURSIVE seq(n) AS (
+            SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?
+        )
+        INSERT INTO user_data
+        SELECT n, 'user' || n, 'user' || n || '@example.com', 18 + n % 60
+        FROM seq
+    ''', (rows,))
+    conn.commit()
+    conn.close()
+
+
+def sync_pagination(path, page_size):
+    """Blocking OFFSET paginator, one connection per page."""
+    offset = 0
+    while True:
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        page = [dict(row) for row in conn.execute(
+            "SELECT * FROM user_data LIMIT ? OFFSET ?", (page_size, offset))]
+        conn.close()
+        if not page:
+            break
+        yield page
+        offset += page_size
+
+
+async def sync_consumer(path, page_size, work):
+    """Consume the blocking paginator from a coroutine."""
+    count = 0
+    for page in sync_pagination(path, page_size):
+        count += len(page)
+        await asyncio.sleep(work)
+    return count
+
+
+async def async_consumer(path, page_size, work, prefetch):
+    """Consume alazy_pagination."""
+    count = 0
+    async for page in alazy_pagination(page_size, path, prefetch=prefetch):
+        count += len(page)
+        await asyncio.sleep(work)
+    return count
+
+
+async def run_variant(factory, consumers):
+    """Run `consumers` copies of a consumer; return (rows, seconds)."""
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(factory() for _ in range(consumers)))
+    return sum(counts), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--consumers", type=int, default=8)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--work-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    work = args.work_ms / 1000
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        build_database(path, args.rows)
+        variants = {
+            "sync": lambda: sync_consumer(path, args.page_size, work),
+            "async": lambda: async_consumer(path, args.page_size, work,
+                                            prefetch=False),
+            "async+prefetch": lambda: async_consumer(path, args.page_size,
+                                                     work, prefetch=True),
+        }
+        print(f"{'variant':<16} {'rows':>10} {'seconds':>9} {'rows/sec':>12}")
+        for name, factory in variants.items():
+            rows, seconds = asyncio.run(run_variant(factory, args.consumers))
+            print(f"{name:<16} {rows:>10,} {seconds:>9.2f} "
+                  f"{rows / seconds:>12,.0f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
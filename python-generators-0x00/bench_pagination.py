@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OFFSET vs keyset (seek) pagination
+=============================================
+
+Compares the per-page latency of the two query shapes used by
+`2-lazy_paginate.py` on an in-memory SQLite stand-in for `user_data`,
+across several table sizes. OFFSET pages get slower the deeper they
+are; keyset pages stay flat.
+
+Usage:
+    python3 bench_pagination.py [--sizes 10000 100000 1000000]
+                                [--page-size 100] [--samples 5]
+"""
+
+import argparse
+import sqlite3
+import time
+
+OFFSET_SQL = "SELECT * FROM user_data ORDER BY user_id LIMIT ? OFFSET ?"
+KEYSET_SQL = ("SELECT * FROM user_data WHERE user_id > ? "
+              "ORDER BY user_id LIMIT ?")
+
+
+def build_table(size):
+    """Create an in-memory user_data table with `size` rows."""
+    conn = sqlite3.connect(":memory:")
+    conn.executescript('''
+        CREATE TABLE user_data (
+            user_id INTEGER PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            age INTEGER
+        );
+    ''')
+    conn.execute('''
+        WITH RECURSIVE seq(n) AS (
+            SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?
+        )
+        INSERT INTO user_data (user_id, name, email, age)
+        SELECT n, 'user' || n, 'user' || n || '@example.com', 18 + n % 60
+        FROM seq
+    ''', (size,))
+    conn.commit()
+    return conn
+
+
+def time_page(conn, sql, params, samples):
+    """Return the best-of-`samples` latency (ms) of one page query."""
+    best = float("inf")
+    for _ in range(samples):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(sizes, page_size, samples):
+    """Print per-page latencies for the first, middle and last page."""
+    print(f"{'rows':>10} {'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for size in sizes:
+        conn = build_table(size)
+        last_page = max((size - 1) // page_size, 0)
+        for label, page in (("first", 0), ("middle", last_page // 2),
+                            ("last", last_page)):
+            offset = page * page_size
+            offset_ms = time_page(conn, OFFSET_SQL, (page_size, offset),
+                                  samples)
+            # user_id is dense and 1-based here, so the row before the
+            # page start has user_id == offset.
+            keyset_ms = time_page(conn, KEYSET_SQL, (offset, page_size),
+                                  samples)
+            print(f"{size:>10} {label:>8} {offset_ms:>10.3f} "
+                  f"{keyset_ms:>10.3f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.page_size, args.samples)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory per row for dict, tuple and UserRow rows
+==========================================================
+
+Builds N user rows in each representation from the same field values
+and reports the bytes allocated per row by the row containers
+(measured with tracemalloc; the field values themselves are shared and
+not counted).
+
+Usage:
+    python3 bench_rows.py [--rows 1000000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from rows import UserRow
+
+
+def measure(build, values):
+    """Return bytes allocated per row by build(values)."""
+    gc.collect()
+    tracemalloc.start()
+    rows = build(values)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return current / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    values = [(i, f"user{i}", f"user{i}@example.com", 18 + i % 60)
+              for i in range(args.rows)]
+    builders = {
+        "dict": lambda vs: [{"user_id": u, "name": n, "email": e, "age": a}
+                            for u, n, e, a in vs],
+        "tuple": lambda vs: [(u, n, e, a) for u, n, e, a in vs],
+        "UserRow": lambda vs: [UserRow(u, n, e, a) for u, n, e, a in vs],
+    }
+    print(f"{'row type':<10} {'bytes/row':>10}")
+    for name, build in builders.items():
+        print(f"{name:<10} {measure(build, values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
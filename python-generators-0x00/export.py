@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Export user_data to Arrow IPC, Parquet or CSV
+=============================================
+
+Consumes `1-batch_processing.py::stream_users_in_batches` in columnar
+mode and writes whole column batches to the output file, never building
+per-row dicts or strings in Python:
+
+- arrow / parquet: each batch becomes a pyarrow RecordBatch (NumPy age
+  columns are handed over without copying).
+- csv: written by pyarrow when it is installed, otherwise by the stdlib
+  csv module straight from the column lists.
+
+With background=True the database reads run on a read-ahead thread
+(see `2-lazy_paginate.py::read_ahead`) while the main thread writes, so
+fetching and encoding overlap.
+
+Usage:
+    python3 export.py users.csv [--format csv|arrow|parquet]
+                      [--batch-size 10000] [--background]
+"""
+
+import argparse
+import csv
+import importlib
+import resource
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pyarrow is optional; CSV export falls back to stdlib
+    pa = None
+
+batch_processing = importlib.import_module("1-batch_processing")
+read_ahead = importlib.import_module("2-lazy_paginate").read_ahead
+
+COLUMNS = batch_processing.COLUMNS
+FORMATS = ("csv", "arrow", "parquet")
+
+
+def arrow_schema():
+    """Schema of the exported user_data columns."""
+    return pa.schema([("id", pa.int64()), ("name", pa.string()),
+                      ("age", pa.int32()), ("country", pa.string())])
+
+
+def to_record_batch(batch, schema):
+    """Build a RecordBatch from a columnar batch."""
+    return pa.RecordBatch.from_arrays(
+        [pa.array(batch[field.name], type=field.type) for field in schema],
+        schema=schema)
+
+
+class StdlibCSVWriter:
+    """CSV writer used when pyarrow is not installed."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, batch):
+        """Write one columnar batch."""
+        self._writer.writerows(zip(*(batch[name] for name in COLUMNS)))
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowWriter:
+    """Arrow IPC, Parquet or CSV writer backed by pyarrow."""
+
+    def __init__(self, path, fmt):
+        self.schema = arrow_schema()
+        if fmt == "arrow":
+            self._writer = pa_ipc.new_file(path, self.schema)
+        elif fmt == "parquet":
+            self._writer = pa_parquet.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa_csv.CSVWriter(path, self.schema)
+        self._parquet = fmt == "parquet"
+
+    def write(self, batch):
+        """Write one columnar batch."""
+        record_batch = to_record_batch(batch, self.schema)
+        if self._parquet:
+            self._writer.write_table(pa.Table.from_batches([record_batch]))
+        else:
+            self._writer.write_batch(record_batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, fmt):
+    """
+    Return a writer for `fmt`.
+
+    Raises:
+        ValueError: For an unknown format.
+        ImportError: For arrow/parquet when pyarrow is not installed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    if pa is None:
+        if fmt != "csv":
+            raise ImportError(f"pyarrow is required for {fmt} export; "
+                              "install it or use format='csv'")
+        return StdlibCSVWriter(path)
+    return ArrowWriter(path, fmt)
+
+
+def peak_rss_kib():
+    """Peak resident set size of this process, in KiB (Linux units)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def export_users(path, fmt="csv", batch_size=10_000, background=False,
+                 depth=4, batches=None):
+    """
+    Export user_data to `path`.
+
+    Args:
+        path (str): Output file.
+        fmt (str): "csv", "arrow" or "parquet".
+        batch_size (int): Rows per batch read from the database.
+        background (bool): Read batches on a read-ahead thread while
+            writing on this one.
+        depth (int): Batches buffered ahead in background mode.
+        batches (iterable): Columnar batches to write instead of reading
+            stream_users_in_batches(batch_size, columnar=True).
+
+    Returns:
+        dict: rows, seconds, rows_per_sec and peak_rss_kib.
+    """
+    writer = open_writer(path, fmt)
+    if batches is None:
+        batches = batch_processing.stream_users_in_batches(batch_size,
+                                                           columnar=True)
+    if background:
+        batches = read_ahead(batches, depth)
+    rows = 0
+    start = time.perf_counter()
+    try:
+        for batch in batches:
+            writer.write(batch)
+            rows += len(batch["id"])
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds else 0.0,
+            "peak_rss_kib": peak_rss_kib()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export user_data.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--background", action="store_true")
+    args = parser.parse_args()
+    stats = export_users(args.path, args.format, args.batch_size,
+                         args.background)
+    print(f"Exported {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/sec, "
+          f"peak RSS {stats['peak_rss_kib'] / 1024:.1f} MiB)")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Range-partitioned parallel scans
+================================
+
+Splits the numeric primary-key range of a table into N chunks and reads
+them concurrently, each worker on its own connection.
+
+Functions:
+-----------
+- partition_ranges(low, high, partitions): split [low, high] into chunks.
+- partitioned_rows(...): merge the chunks into one unordered row stream
+  (worker threads, bounded queue).
+- partitioned_aggregate(...): reduce each chunk to a mergeable
+  aggregates.StreamAggregator (worker processes by default) and merge
+  the partials.
+
+Connections are obtained through a `scope` callable returning a context
+manager that yields a connection, e.g. `pool.get_pool().connection` or
+`functools.partial(sqlite_connection, "airbnb.db")`. Process workers need
+a picklable scope.
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+
+from aggregates import StreamAggregator
+
+_DONE = object()
+
+
+@contextmanager
+def sqlite_connection(path):
+    """Connection scope for an SQLite database file."""
+    with closing(sqlite3.connect(path)) as conn:
+        yield conn
+
+
+def key_bounds(scope, table, key):
+    """Return (min, max) of `key` in `table`, or (None, None) if empty."""
+    with scope() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+        bounds = cursor.fetchone()
+        cursor.close()
+    return tuple(bounds)
+
+
+def partition_ranges(low, high, partitions):
+    """
+    Split the inclusive key range [low, high] into half-open chunks.
+
+    Returns:
+        list[tuple]: (start, stop) pairs covering low..high exactly once.
+    """
+    if low is None or high is None:
+        return []
+    span = high - low + 1
+    partitions = max(1, min(partitions, span))
+    step, extra = divmod(span, partitions)
+    ranges, start = [], low
+    for i in range(partitions):
+        stop = start + step + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _range_sql(table, columns, key, placeholder):
+    """SELECT statement reading one [start, stop) chunk of the key range."""
+    return (f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE {key} >= {placeholder} AND {key} < {placeholder}")
+
+
+def _iter_chunk(scope, sql, bounds, fetch_size, cursor_kwargs):
+    """Yield lists of rows for one chunk from a fresh connection."""
+    with scope() as conn:
+        cursor = conn.cursor(**cursor_kwargs)
+        cursor.execute(sql, bounds)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+
+
+def partitioned_rows(scope, table, columns, key, partitions=4,
+                     fetch_size=1000, placeholder="?", cursor_kwargs=None):
+    """
+    Stream every row of `table`, reading key-range chunks concurrently.
+
+    Rows arrive in no particular order. Closing the generator early
+    stops the workers after their current fetch.
+
+    Args:
+        scope (callable): Returns a context manager yielding a connection.
+        table (str): Table to scan.
+        columns (sequence): Columns to select.
+        key (str): Numeric primary-key column to partition on.
+        partitions (int): Number of chunks / worker threads.
+        fetch_size (int): Rows per fetchmany() call in each worker.
+        placeholder (str): Bind placeholder of the driver ("?" or "%s").
+        cursor_kwargs (dict): Extra arguments for connection.cursor().
+
+    Yields:
+        Rows as returned by the driver's cursor.
+    """
+    ranges = partition_ranges(*key_bounds(scope, table, key), partitions)
+    if not ranges:
+        return
+    sql = _range_sql(table, columns, key, placeholder)
+    cursor_kwargs = cursor_kwargs or {}
+    chunks = queue.Queue(maxsize=len(ranges) * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(bounds):
+        try:
+            for rows in _iter_chunk(scope, sql, bounds, fetch_size,
+                                    cursor_kwargs):
+                if not put(rows):
+                    return
+        except BaseException as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=len(ranges))
+    try:
+        for bounds in ranges:
+            executor.submit(worker, bounds)
+        running = len(ranges)
+        while running:
+            item = chunks.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _aggregate_chunk(scope, sql, bounds, fetch_size, hll_precision):
+    """Worker: reduce one chunk's first column to a StreamAggregator."""
+    partial = StreamAggregator(quantiles=(), hll_precision=hll_precision)
+    for rows in _iter_chunk(scope, sql, bounds, fetch_size, {}):
+        for row in rows:
+            partial.update(row[0])
+    return partial
+
+
+def partitioned_aggregate(scope, table, column, key, partitions=4,
+                          fetch_size=1000, placeholder="?", processes=True,
+                          hll_precision=12):
+    """
+    Aggregate one column of `table` with one worker per key-range chunk.
+
+    Each worker builds a partial StreamAggregator (moments, min/max and
+    distinct count; quantile sketches are not mergeable and are left
+    out) and the partials are merged here.
+
+    Args:
+        processes (bool): Use worker processes (scales with cores) rather
+            than threads. `scope` must then be picklable.
+
+    Returns:
+        aggregates.StreamAggregator: Merged statistics for the table.
+    """
+    total = StreamAggregator(quantiles=(), hll_precision=hll_precision)
+    ranges = partition_ranges(*key_bounds(scope, table, key), partitions)
+    if not ranges:
+        return total
+    sql = _range_sql(table, (column,), key, placeholder)
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool_class(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(_aggregate_chunk, scope, sql, bounds,
+                                   fetch_size, hll_precision)
+                   for bounds in ranges]
+        for future in futures:
+            total.merge(future.result())
+    return total
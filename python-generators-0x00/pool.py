@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+"""
+Connection pool for the python-generators-0x00 streamers
+========================================================
+
+Keeps a bounded set of database connections so that the generators can
+borrow one per page or per stream instead of opening and closing a fresh
+connection each time. get_pool() returns the MySQL pool dialed through
+`seed.connect_to_prodev()`; get_pool("airbnb.db") returns a pool of
+SQLite connections to that file. Each pool knows its driver's bind
+parameter style in `placeholder`.
+
+Features:
+---------
+- Bounded size: at most `max_size` connections are checked out at once;
+  further callers block until one is returned.
+- Health check on checkout: a pooled connection that no longer answers
+  is thrown away and replaced.
+- Idle eviction: connections that sat unused longer than `idle_timeout`
+  seconds are closed instead of being handed out.
+- Statement cache: prepared() keeps one prepared cursor per SQL string
+  and connection, so a statement is parsed and planned once per
+  connection and then re-executed with new parameters. (With drivers or
+  cursor options that have no prepared cursor only the cursor object is
+  reused.) Hit and miss counters are available from statement_stats().
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+def ping(connection):
+    """
+    Return True if `connection` is still usable.
+
+    Uses the driver's own check when it has one (mysql-connector's
+    is_connected()), and falls back to a trivial round trip otherwise.
+    """
+    try:
+        if hasattr(connection, "is_connected"):
+            return connection.is_connected()
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections."""
+
+    def __init__(self, connect, max_size=5, idle_timeout=300.0,
+                 health_check=ping, placeholder="%s"):
+        """
+        Args:
+            connect (callable): Zero-argument factory returning a new
+                DB-API connection.
+            max_size (int): Maximum number of connections checked out
+                at the same time.
+            idle_timeout (float): Seconds a pooled connection may stay
+                idle before it is evicted.
+            health_check (callable): Called with a pooled connection on
+                checkout; a falsy result discards it.
+            placeholder (str): Bind parameter marker of the driver,
+                "%s" for mysql-connector, "?" for sqlite3.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._health_check = health_check
+        self.placeholder = placeholder
+        self._idle = deque()  # (connection, last_used) pairs, newest last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        # id(connection) -> {(sql, cursor options): cursor}; entries are
+        # dropped in _close(), so ids are never reused while cached.
+        self._statements = {}
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def acquire(self, timeout=None):
+        """
+        Check a connection out of the pool.
+
+        Args:
+            timeout (float): Seconds to wait for a free slot, or None to
+                wait forever.
+
+        Returns:
+            A live connection. Give it back with release() or discard().
+
+        Raises:
+            PoolTimeout: If no slot frees up within `timeout`.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No connection available after {timeout}s")
+        try:
+            while True:
+                connection = self._pop_idle()
+                if connection is None:
+                    return self._connect()
+                if self._health_check is None or \
+                        self._health_check(connection):
+                    return connection
+                self._close(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Return a healthy connection to the pool for reuse."""
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, connection):
+        """Close a connection instead of returning it to the pool."""
+        self._close(connection)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        The connection goes back to the pool on a clean exit. If the
+        block raises (including GeneratorExit when a generator holding
+        it is closed early) it may have unread results or a broken
+        transaction, so it is closed instead.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except BaseException:
+            self.discard(connection)
+            raise
+        self.release(connection)
+
+    def prepared(self, connection, sql, **cursor_kwargs):
+        """
+        Return the cached prepared cursor for `sql` on `connection`.
+
+        The cursor is created (and the statement prepared by the server
+        on its first execute) only once per connection; later calls are
+        cache hits. Callers must execute `sql` with bind parameters and
+        consume the results before the connection is used again.
+
+        Drivers without server-side prepared statements (sqlite3), or
+        without a prepared variant for the requested options
+        (mysql-connector with dictionary=True), get a plain cursor
+        instead. Then only the cursor is reused: the statement is parsed
+        again on every execute unless the driver keeps its own cache, as
+        sqlite3 does and mysql-connector does not. Ask for a tuple
+        cursor to get a prepared statement on MySQL.
+
+        Args:
+            connection: A connection checked out of this pool.
+            sql (str): Parameterized statement.
+            **cursor_kwargs: Extra options for connection.cursor(),
+                e.g. buffered=True.
+        """
+        key = (sql, tuple(sorted(cursor_kwargs.items())))
+        with self._lock:
+            statements = self._statements.setdefault(id(connection), {})
+            cursor = statements.get(key)
+            if cursor is not None:
+                self.statement_hits += 1
+                return cursor
+            self.statement_misses += 1
+        try:
+            cursor = connection.cursor(prepared=True, **cursor_kwargs)
+        except (TypeError, ValueError):
+            # sqlite3 rejects the keyword; mysql-connector raises
+            # ValueError for option combinations it has no cursor for.
+            cursor = connection.cursor(**cursor_kwargs)
+        with self._lock:
+            statements[key] = cursor
+        return cursor
+
+    def statement_stats(self):
+        """Return statement-cache counters as a dict."""
+        with self._lock:
+            return {"hits": self.statement_hits,
+                    "misses": self.statement_misses,
+                    "cached": sum(map(len, self._statements.values()))}
+
+    def close_all(self):
+        """Close every idle connection currently held by the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._close(connection)
+
+    def _pop_idle(self):
+        """Return the most recently used idle connection, evicting stale ones."""
+        expired = []
+        connection = None
+        with self._lock:
+            cutoff = time.monotonic() - self.idle_timeout
+            while self._idle and self._idle[0][1] < cutoff:
+                expired.append(self._idle.popleft()[0])
+            if self._idle:
+                connection = self._idle.pop()[0]
+        for stale in expired:
+            self._close(stale)
+        return connection
+
+    def _close(self, connection):
+        """Close a connection, ignoring errors from already-dead ones."""
+        with self._lock:
+            statements = self._statements.pop(id(connection), {})
+        try:
+            for cursor in statements.values():
+                cursor.close()
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _connect_to_prodev():
+    """Dial a new connection through seed.connect_to_prodev()."""
+    import seed
+    return seed.connect_to_prodev()
+
+
+def _sqlite_connector(path):
+    """Connection factory for a SQLite file, usable from any thread."""
+    def connect():
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+
+def get_pool(database=None):
+    """
+    Return the shared pool for `database`.
+
+    Args:
+        database (str): Path of a SQLite database file, or None for the
+            MySQL database behind seed.connect_to_prodev().
+    """
+    with _pools_lock:
+        connection_pool = _pools.get(database)
+        if connection_pool is None:
+            if database is None:
+                connection_pool = ConnectionPool(_connect_to_prodev)
+            else:
+                connection_pool = ConnectionPool(
+                    _sqlite_connector(database), placeholder="?")
+            _pools[database] = connection_pool
+        return connection_pool
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Compact row objects for the generator outputs
+=============================================
+
+`UserRow` stores a user_data row in a `__slots__` object instead of a
+dict: no per-instance __dict__ and no hash table, so pipelines that
+buffer many rows (e.g. pages from lazy_pagination) use a fraction of the
+memory. It supports attribute access, `row["user_id"]` lookups for code
+written against dict rows, and `to_dict()`.
+
+Pass `row_factory=UserRow.from_dict` to stream_users() or
+lazy_pagination() to get UserRow objects instead of dicts.
+"""
+
+
+class UserRow:
+    """One user_data row."""
+
+    __slots__ = ("user_id", "name", "email", "age")
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    @classmethod
+    def from_dict(cls, row):
+        """Build a UserRow from a dictionary-cursor row."""
+        return cls(row["user_id"], row["name"], row["email"], row["age"])
+
+    def to_dict(self):
+        """Return the row as a dict, as the dictionary cursors do."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __getitem__(self, key):
+        """Dict-style access, e.g. row["user_id"]."""
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}"
+                           for name in self.__slots__)
+        return f"UserRow({fields})"
@@ -1,17 +1,51 @@
-import sqlite3
+#!/usr/bin/env python3
+"""
+Bulk seeder for the Airbnb clone database
+=========================================
+
+Creates the users, properties, bookings, payments and reviews tables and
+fills them with fake data fast enough for multi-million-row fixtures:
+
+- Faker is only used to build small pools of names, cities, words and
+  sentences; rows are then assembled in chunks from those pools with
+  random.choices(), which is far cheaper than one Faker call per field.
+- Ids are assigned up front, so every chunk is written with a single
+  executemany() and foreign keys (host_id, booking_id, ...) are drawn
+  from known id ranges instead of cursor.lastrowid. New ids continue
+  from each table's MAX(id), so seeding an existing database appends
+  to it; --reset drops the tables first.
+- Each table is loaded inside one transaction with journal_mode=WAL and
+  synchronous=OFF; both are restored once the load is done.
+- --seed makes the generated data reproducible for benchmarks.
+- --workers N generates chunks ("shards") in N worker processes. Every
+  shard covers a fixed id range and has its own RNG derived from the
+  seed, the table and its first id, so the output is identical whatever
+  the number of workers. The parent process is the single writer and
+  inserts shards in id order.
+- Secondary indexes are built after the load (cheaper than maintaining
+  them row by row) and check_query_plans() verifies with EXPLAIN QUERY
+  PLAN that every query in KNOWN_QUERIES is served by an index.
+
+Usage:
+    python3 seed.py [--db airbnb_clone.db] [--users 20] [--properties 30]
+                    [--bookings 40] [--reviews 50] [--chunk-size 50000]
+                    [--seed 42] [--workers 4] [--check-plans] [--reset]
+"""
+
+import argparse
 import random
-from datetime import datetime, timedelta
-from faker import Faker
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from hashlib import blake2b
 
-# Initialize Faker for generating fake data
-fake = Faker()
+from faker import Faker
 
-# Connect to the SQLite database (change if using PostgreSQL/MySQL)
-conn = sqlite3.connect('airbnb_clone.db')
-cursor = conn.cursor()
+DB_PATH = "airbnb_clone.db"
 
-# Create tables if not exist (for local testing)
-cursor.executescript('''
+SCHEMA = '''
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT,
@@ -59,74 +93,494 @@ CREATE TABLE IF NOT EXISTS reviews (
     FOREIGN KEY (property_id) REFERENCES properties(id),
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
-''')
-
-conn.commit()
-
-# ---------- SEED DATA ----------
-NUM_USERS = 20
-NUM_PROPERTIES = 30
-NUM_BOOKINGS = 40
-NUM_PAYMENTS = 40
-NUM_REVIEWS = 50
-
-# --- USERS ---
-users = []
-for _ in range(NUM_USERS):
-    name = fake.name()
-    email = fake.unique.email()
-    cursor.execute("INSERT INTO users (name, email) VALUES (?, ?)", (name, email))
-    users.append(cursor.lastrowid)
-
-# --- PROPERTIES ---
-properties = []
-for _ in range(NUM_PROPERTIES):
-    name = fake.word().capitalize() + " Apartment"
-    location = fake.city()
-    price_per_night = round(random.uniform(40, 400), 2)
-    host_id = random.choice(users)
-    cursor.execute(
-        "INSERT INTO properties (name, location, price_per_night, host_id) VALUES (?, ?, ?, ?)",
-        (name, location, price_per_night, host_id)
-    )
-    properties.append(cursor.lastrowid)
-
-# --- BOOKINGS ---
-bookings = []
-for _ in range(NUM_BOOKINGS):
-    user_id = random.choice(users)
-    property_id = random.choice(properties)
-    check_in = fake.date_between(start_date="-3y", end_date="today")
-    check_out = check_in + timedelta(days=random.randint(1, 10))
-    total_amount = round(random.uniform(100, 1500), 2)
-    cursor.execute('''
-        INSERT INTO bookings (user_id, property_id, check_in, check_out, total_amount)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (user_id, property_id, check_in, check_out, total_amount))
-    bookings.append(cursor.lastrowid)
-
-# --- PAYMENTS ---
-for booking_id in bookings:
-    payment_date = fake.date_between(start_date="-3y", end_date="today")
-    amount = round(random.uniform(100, 1500), 2)
-    status = random.choice(["Completed", "Pending", "Failed"])
-    cursor.execute('''
-        INSERT INTO payments (booking_id, payment_date, amount, status)
-        VALUES (?, ?, ?, ?)
-    ''', (booking_id, payment_date, amount, status))
-
-# --- REVIEWS ---
-for _ in range(NUM_REVIEWS):
-    property_id = random.choice(properties)
-    user_id = random.choice(users)
-    rating = random.randint(1, 5)
-    comment = fake.sentence(nb_words=12)
-    cursor.execute('''
-        INSERT INTO reviews (property_id, user_id, rating, comment)
-        VALUES (?, ?, ?, ?)
-    ''', (property_id, user_id, rating, comment))
-
-conn.commit()
-conn.close()
-
-print("✅ Database seeded successfully with sample data!")
+'''
+
+INSERTS = {
+    "users": "INSERT INTO users (id, name, email) VALUES (?, ?, ?)",
+    "properties": ("INSERT INTO properties "
+                   "(id, name, location, price_per_night, host_id) "
+                   "VALUES (?, ?, ?, ?, ?)"),
+    "bookings": ("INSERT INTO bookings "
+                 "(id, user_id, property_id, check_in, check_out, total_amount) "
+                 "VALUES (?, ?, ?, ?, ?, ?)"),
+    "payments": ("INSERT INTO payments "
+                 "(id, booking_id, payment_date, amount, status) "
+                 "VALUES (?, ?, ?, ?, ?)"),
+    "reviews": ("INSERT INTO reviews "
+                "(id, property_id, user_id, rating, comment) "
+                "VALUES (?, ?, ?, ?, ?)"),
+}
+
+DEFAULT_COUNTS = {
+    "users": 20,
+    "properties": 30,
+    "bookings": 40,
+    "reviews": 50,
+}
+
+# name -> (table, columns). users.email is already covered by its UNIQUE
+# constraint. user_data belongs to the generator tasks and is indexed
+# only when it exists in the database.
+INDEXES = {
+    "idx_properties_host_id": ("properties", ("host_id",)),
+    "idx_bookings_user_id": ("bookings", ("user_id",)),
+    "idx_bookings_property_id": ("bookings", ("property_id",)),
+    "idx_payments_booking_id": ("payments", ("booking_id",)),
+    "idx_reviews_property_id": ("reviews", ("property_id",)),
+    "idx_reviews_user_id": ("reviews", ("user_id",)),
+    "idx_user_data_age": ("user_data", ("age",)),
+}
+
+# Queries run by the generators and decorators: name -> (sql, params).
+KNOWN_QUERIES = {
+    "user_by_id": ("SELECT * FROM users WHERE id = ?", (1,)),
+    "user_by_email": ("SELECT * FROM users WHERE email = ?", ("a@b.c",)),
+    "properties_by_host": ("SELECT * FROM properties WHERE host_id = ?",
+                           (1,)),
+    "bookings_by_user": (
+        "SELECT b.id, p.name, b.check_in FROM bookings b "
+        "JOIN properties p ON p.id = b.property_id WHERE b.user_id = ?",
+        (1,)),
+    "bookings_by_property": (
+        "SELECT b.id, u.name FROM bookings b "
+        "JOIN users u ON u.id = b.user_id WHERE b.property_id = ?", (1,)),
+    "payments_by_booking": ("SELECT * FROM payments WHERE booking_id = ?",
+                            (1,)),
+    "reviews_by_property": (
+        "SELECT r.rating, r.comment, u.name FROM reviews r "
+        "JOIN users u ON u.id = r.user_id WHERE r.property_id = ?", (1,)),
+    "reviews_by_user": ("SELECT * FROM reviews WHERE user_id = ?", (1,)),
+    "user_data_by_age": ("SELECT * FROM user_data WHERE age > ?", (25,)),
+}
+
+POOL_SIZE = 1000
+PAYMENT_STATUSES = ("Completed", "Pending", "Failed")
+HISTORY_DAYS = 3 * 365
+
+
+def connect(db_path=DB_PATH):
+    """Open the SQLite database used by the seeder."""
+    return sqlite3.connect(db_path)
+
+
+def create_tables(conn):
+    """Create the schema if it does not exist yet."""
+    conn.executescript(SCHEMA)
+    conn.commit()
+
+
+def drop_tables(conn):
+    """Drop the seeded tables (children first)."""
+    with conn:
+        for table in reversed(list(INSERTS)):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def max_ids(conn):
+    """Return table -> largest id already present (0 when empty)."""
+    return {table: conn.execute(
+                f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            for table in INSERTS}
+
+
+def apply_load_pragmas(conn):
+    """
+    Trade durability for speed while bulk loading.
+
+    Returns:
+        dict: The previous settings, for restore_pragmas().
+    """
+    previous = {
+        "journal_mode": conn.execute("PRAGMA journal_mode").fetchone()[0],
+        "synchronous": conn.execute("PRAGMA synchronous").fetchone()[0],
+    }
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    return previous
+
+
+def restore_pragmas(conn, previous):
+    """Put back the settings apply_load_pragmas() replaced."""
+    conn.execute(f"PRAGMA journal_mode={previous['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous={int(previous['synchronous'])}")
+
+
+def existing_tables(conn):
+    """Return the names of the tables in the database."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    return {name for (name,) in rows}
+
+
+def create_indexes(conn):
+    """
+    Build the secondary indexes in INDEXES for the tables that exist.
+
+    Returns:
+        list[str]: Names of the indexes now present.
+    """
+    tables = existing_tables(conn)
+    created = []
+    with conn:
+        for name, (table, columns) in INDEXES.items():
+            if table not in tables:
+                continue
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} "
+                         f"ON {table} ({', '.join(columns)})")
+            created.append(name)
+        conn.execute("ANALYZE")
+    return created
+
+
+def explain(conn, sql, params=()):
+    """Return the detail column of EXPLAIN QUERY PLAN for `sql`."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    """Return the plan steps that read a whole table without an index."""
+    return [step for step in plan
+            if step.startswith("SCAN ") and " INDEX " not in step]
+
+
+def check_query_plans(conn, queries=None):
+    """
+    Check that every known query is served by an index.
+
+    Queries on tables that do not exist are skipped.
+
+    Args:
+        conn (sqlite3.Connection): Database to check.
+        queries (dict): name -> (sql, params); defaults to KNOWN_QUERIES.
+
+    Returns:
+        dict: Query name -> list of full-scan plan steps, for each query
+        that does not use an index. Empty when every plan is indexed.
+    """
+    problems = {}
+    for name, (sql, params) in (queries or KNOWN_QUERIES).items():
+        try:
+            plan = explain(conn, sql, params)
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            continue
+        scans = full_scans(plan)
+        if scans:
+            problems[name] = scans
+    return problems
+
+
+def build_pools(seed=None, size=POOL_SIZE):
+    """
+    Generate the pools of fake values rows are assembled from.
+
+    Returns:
+        dict: name, domain, city, word and sentence pools.
+    """
+    fake = Faker()
+    if seed is not None:
+        fake.seed_instance(seed)
+    return {
+        "name": [fake.name() for _ in range(size)],
+        "domain": [fake.free_email_domain() for _ in range(size // 50 or 1)],
+        "city": [fake.city() for _ in range(size)],
+        "word": [fake.word().capitalize() for _ in range(size)],
+        "sentence": [fake.sentence(nb_words=12) for _ in range(size)],
+    }
+
+
+def _chunks(start_id, count, chunk_size):
+    """Yield (first_id, size) pairs covering ids start_id..start_id+count-1."""
+    for offset in range(0, count, chunk_size):
+        yield start_id + offset, min(chunk_size, count - offset)
+
+
+def _dates(rng, size, today):
+    """Random dates within the last HISTORY_DAYS days."""
+    return [today - timedelta(days=d)
+            for d in rng.choices(range(HISTORY_DAYS), k=size)]
+
+
+def user_rows(rng, pools, first_id, size):
+    """Rows for users first_id..first_id+size-1; emails are unique by id."""
+    ids = range(first_id, first_id + size)
+    names = rng.choices(pools["name"], k=size)
+    domains = rng.choices(pools["domain"], k=size)
+    return [(i, name, f"{name.lower().replace(' ', '.')}.{i}@{domain}")
+            for i, name, domain in zip(ids, names, domains)]
+
+
+def property_rows(rng, pools, first_id, size, user_count):
+    """Rows for properties hosted by users 1..user_count."""
+    ids = range(first_id, first_id + size)
+    words = rng.choices(pools["word"], k=size)
+    cities = rng.choices(pools["city"], k=size)
+    hosts = [rng.randint(1, user_count) for _ in range(size)]
+    return [(i, word + " Apartment", city, round(rng.uniform(40, 400), 2), host)
+            for i, word, city, host in zip(ids, words, cities, hosts)]
+
+
+def booking_rows(rng, first_id, size, user_count, property_count, today):
+    """Rows for bookings referencing existing users and properties."""
+    check_ins = _dates(rng, size, today)
+    return [(i, rng.randint(1, user_count), rng.randint(1, property_count),
+             check_in.isoformat(),
+             (check_in + timedelta(days=rng.randint(1, 10))).isoformat(),
+             round(rng.uniform(100, 1500), 2))
+            for i, check_in in zip(range(first_id, first_id + size),
+                                   check_ins)]
+
+
+def payment_rows(rng, first_id, size, today, booking_shift=0):
+    """
+    Rows for payments first_id..first_id+size-1, one per booking; payment
+    i pays booking i + booking_shift.
+    """
+    dates = _dates(rng, size, today)
+    statuses = rng.choices(PAYMENT_STATUSES, k=size)
+    return [(i, i + booking_shift, day.isoformat(),
+             round(rng.uniform(100, 1500), 2), status)
+            for i, day, status in zip(range(first_id, first_id + size),
+                                      dates, statuses)]
+
+
+def review_rows(rng, pools, first_id, size, user_count, property_count):
+    """Rows for reviews referencing existing users and properties."""
+    comments = rng.choices(pools["sentence"], k=size)
+    return [(i, rng.randint(1, property_count), rng.randint(1, user_count),
+             rng.randint(1, 5), comment)
+            for i, comment in zip(range(first_id, first_id + size), comments)]
+
+
+def generate_table(table, rng, pools, first_id, size, counts, today):
+    """
+    Dispatch to the row generator for `table`.
+
+    `counts` maps each table to its last id once the load is done, so
+    foreign keys can point at any existing row; payments also gets the
+    offset between the new payment and booking ids.
+    """
+    if table == "users":
+        return user_rows(rng, pools, first_id, size)
+    if table == "properties":
+        return property_rows(rng, pools, first_id, size, counts["users"])
+    if table == "bookings":
+        return booking_rows(rng, first_id, size, counts["users"],
+                            counts["properties"], today)
+    if table == "payments":
+        return payment_rows(rng, first_id, size, today,
+                            counts.get("booking_shift", 0))
+    if table == "reviews":
+        return review_rows(rng, pools, first_id, size, counts["users"],
+                           counts["properties"])
+    raise ValueError(f"Unknown table: {table!r}")
+
+
+def shard_seed(seed, table, first_id):
+    """Derive the RNG seed of the shard of `table` starting at `first_id`."""
+    digest = blake2b(f"{seed}:{table}:{first_id}".encode("utf-8"),
+                     digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def generate_shard(pools, table, first_id, size, counts, seed, today):
+    """Generate the rows of one shard with its own deterministic RNG."""
+    rng = random.Random(shard_seed(seed, table, first_id))
+    return generate_table(table, rng, pools, first_id, size, counts, today)
+
+
+_worker_pools = None
+
+
+def _init_worker(pools):
+    """Process-pool initializer: receive the value pools once per worker."""
+    global _worker_pools
+    _worker_pools = pools
+
+
+def _generate_in_worker(*args):
+    """Process-pool task: generate one shard using the worker's pools."""
+    return generate_shard(_worker_pools, *args)
+
+
+def sharded_chunks(executor, pools, table, counts, seed, today, chunk_size,
+                   window, offsets=None):
+    """
+    Yield the shards of `table` in id order.
+
+    New ids start after offsets[table]. With an executor, at most
+    `window` shards are in flight so memory stays bounded while the
+    writer catches up.
+    """
+    offset = (offsets or {}).get(table, 0)
+    shards = _chunks(offset + 1, counts[table] - offset, chunk_size)
+    if executor is None:
+        for first_id, size in shards:
+            yield generate_shard(pools, table, first_id, size, counts, seed,
+                                 today)
+        return
+    pending = deque()
+    for first_id, size in shards:
+        pending.append(executor.submit(_generate_in_worker, table, first_id,
+                                       size, counts, seed, today))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def table_counts(counts, offsets=None):
+    """
+    Fill in defaults and derive the payment count (one per booking).
+
+    With `offsets` (table -> ids already present), the result maps each
+    table to its last id after the load instead of the rows to add.
+    """
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    counts["payments"] = counts["bookings"]
+    new = dict(counts)
+    if offsets:
+        counts = {table: offsets.get(table, 0) + count
+                  for table, count in counts.items()}
+        counts["booking_shift"] = (offsets.get("bookings", 0)
+                                   - offsets.get("payments", 0))
+    if counts["users"] < 1 and (new["properties"] or new["bookings"]
+                                or new["reviews"]):
+        raise ValueError("At least one user is required")
+    if counts["properties"] < 1 and (new["bookings"] or new["reviews"]):
+        raise ValueError("At least one property is required")
+    return counts
+
+
+def load_rows(conn, table, chunks):
+    """
+    Insert chunks of rows into `table` inside a single transaction.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    total = 0
+    with conn:
+        for rows in chunks:
+            conn.executemany(INSERTS[table], rows)
+            total += len(rows)
+    return total
+
+
+def seed_database(conn, counts=None, seed=None, chunk_size=50_000,
+                  workers=1, indexes=True):
+    """
+    Populate every table with generated rows.
+
+    Args:
+        conn (sqlite3.Connection): Target database; tables must exist.
+            Rows already present are kept and new ids follow them.
+        counts (dict): Rows to add per table (users, properties,
+            bookings, reviews); payments always get one row per booking.
+        seed (int): Seed for Faker and the RNG, for reproducible data.
+        chunk_size (int): Rows per shard, i.e. per executemany().
+        workers (int): Processes generating shards; 1 generates inline.
+        indexes (bool): Build the secondary indexes after the load.
+
+    Returns:
+        dict: Table name -> (rows inserted, seconds taken).
+    """
+    offsets = max_ids(conn)
+    counts = table_counts(counts, offsets)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+        today = date.today()
+    else:
+        today = date(2025, 1, 1)
+    pools = build_pools(seed)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_init_worker,
+                                       initargs=(pools,))
+    stats = {}
+    previous = apply_load_pragmas(conn)
+    try:
+        for table in INSERTS:
+            start = time.perf_counter()
+            chunks = sharded_chunks(executor, pools, table, counts, seed,
+                                    today, chunk_size, window=workers * 2,
+                                    offsets=offsets)
+            rows = load_rows(conn, table, chunks)
+            stats[table] = (rows, time.perf_counter() - start)
+    finally:
+        restore_pragmas(conn, previous)
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if indexes:
+        start = time.perf_counter()
+        create_indexes(conn)
+        stats["indexes"] = (0, time.perf_counter() - start)
+    return stats
+
+
+def report(stats):
+    """Print rows/sec per table and overall."""
+    total_rows = total_time = 0
+    for table, (rows, seconds) in stats.items():
+        total_rows += rows
+        total_time += seconds
+        if not rows:
+            print(f"{table:<12} {'':>17} {seconds:>8.2f}s")
+            continue
+        rate = rows / seconds if seconds else 0
+        print(f"{table:<12} {rows:>12,} rows {seconds:>8.2f}s "
+              f"{rate:>12,.0f} rows/sec")
+    rate = total_rows / total_time if total_time else 0
+    print(f"{'total':<12} {total_rows:>12,} rows {total_time:>8.2f}s "
+          f"{rate:>12,.0f} rows/sec")
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Bulk-seed the database.")
+    parser.add_argument("--db", default=DB_PATH)
+    for table, default in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{table}", type=int, default=default,
+                            help=f"number of {table} (default {default})")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible data")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes generating shards (default 1)")
+    parser.add_argument("--no-indexes", dest="indexes",
+                        action="store_false",
+                        help="skip building secondary indexes")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="fail if a known query does a full scan")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop the tables first instead of appending")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Create the schema, seed it and report throughput."""
+    args = parse_args(argv)
+    counts = {table: getattr(args, table) for table in DEFAULT_COUNTS}
+    conn = connect(args.db)
+    try:
+        if args.reset:
+            drop_tables(conn)
+        create_tables(conn)
+        stats = seed_database(conn, counts, args.seed, args.chunk_size,
+                              args.workers, args.indexes)
+        problems = check_query_plans(conn) if args.check_plans else {}
+    finally:
+        conn.close()
+    report(stats)
+    print("✅ Database seeded successfully with sample data!")
+    for name, scans in problems.items():
+        print(f"❌ {name}: {'; '.join(scans)}")
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
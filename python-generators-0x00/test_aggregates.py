@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the aggregates module.
+"""
+import random
+import statistics
+import unittest
+
+from aggregates import HyperLogLog, Moments, aggregate
+
+
+class TestAggregates(unittest.TestCase):
+    """Test cases for the streaming aggregates."""
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.values = [rng.randint(18, 90) for _ in range(20000)]
+
+    def test_moments_match_statistics(self):
+        """Welford mean and variance match the exact values."""
+        result = aggregate(self.values)
+        self.assertEqual(result["count"], len(self.values))
+        self.assertEqual(result["sum"], sum(self.values))
+        self.assertAlmostEqual(result["mean"], statistics.mean(self.values))
+        self.assertAlmostEqual(result["variance"],
+                               statistics.pvariance(self.values))
+        self.assertEqual(result["min"], min(self.values))
+        self.assertEqual(result["max"], max(self.values))
+
+    def test_quantiles_and_distinct_are_close(self):
+        """P-square quantiles and HyperLogLog stay near the exact values."""
+        result = aggregate(self.values, quantiles=(0.5, 0.9))
+        exact = statistics.quantiles(self.values, n=10)
+        self.assertAlmostEqual(result["quantiles"][0.5], exact[4], delta=1.5)
+        self.assertAlmostEqual(result["quantiles"][0.9], exact[8], delta=1.5)
+        self.assertAlmostEqual(result["distinct"], len(set(self.values)),
+                               delta=2)
+
+    def test_merge_equals_single_pass(self):
+        """Merged partials give the same answer as one pass."""
+        whole, left, right = Moments(), Moments(), Moments()
+        hll_left, hll_right, hll_whole = (HyperLogLog(), HyperLogLog(),
+                                          HyperLogLog())
+        for i, x in enumerate(self.values):
+            whole.update(x)
+            hll_whole.update(x)
+            (left if i % 3 else right).update(x)
+            (hll_left if i % 3 else hll_right).update(x)
+        left.merge(right)
+        hll_left.merge(hll_right)
+        self.assertEqual(left.count, whole.count)
+        self.assertAlmostEqual(left.mean, whole.mean)
+        self.assertAlmostEqual(left.variance(), whole.variance())
+        self.assertEqual(hll_left.count(), hll_whole.count())
+
+    def test_empty_stream(self):
+        """An empty stream gives empty statistics, not errors."""
+        result = aggregate([])
+        self.assertEqual(result["count"], 0)
+        self.assertIsNone(result["mean"])
+        self.assertEqual(result["distinct"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async_streams async generators.
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from async_streams import alazy_pagination, astream_user_ages, astream_users
+
+ROWS = [(i, f"user{i}", 18 + i % 50) for i in range(1, 24)]
+
+
+async def collect(agen, limit=None):
+    """Consume an async generator, stopping early after `limit` items."""
+    items = []
+    try:
+        async for item in agen:
+            items.append(item)
+            if limit is not None and len(items) == limit:
+                break
+    finally:
+        await agen.aclose()
+    return items
+
+
+class AsyncStreamsTestCase(unittest.TestCase):
+    """
+    Gives each test a user_data table keyed on KEY, with its rows
+    inserted out of key order so OFFSET and keyset order differ.
+    """
+
+    KEY = "id"
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(f"CREATE TABLE user_data ({self.KEY} INTEGER "
+                         f"PRIMARY KEY, name TEXT, age INTEGER) WITHOUT ROWID")
+            conn.executemany("INSERT INTO user_data VALUES (?, ?, ?)",
+                             ROWS[::2] + ROWS[1::2])
+        conn.close()
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def dicts(self, rows):
+        return [{self.KEY: i, "name": name, "age": age}
+                for i, name, age in rows]
+
+
+class TestStreams(AsyncStreamsTestCase):
+    """Test cases for astream_users and astream_user_ages."""
+
+    def test_stream_users_yields_every_row(self):
+        """Rows come back one dict at a time across fetchmany calls."""
+        rows = self.run_async(collect(astream_users(self.path, 5)))
+        self.assertEqual(sorted(rows, key=lambda row: row["id"]),
+                         self.dicts(ROWS))
+
+    def test_stream_user_ages(self):
+        """Ages are yielded one by one."""
+        ages = self.run_async(collect(astream_user_ages(self.path, 4)))
+        self.assertEqual(sorted(ages), sorted(age for _, _, age in ROWS))
+
+
+class TestPagination(AsyncStreamsTestCase):
+    """Test cases for alazy_pagination in OFFSET and keyset modes."""
+
+    def pages(self, **kwargs):
+        return self.run_async(collect(alazy_pagination(5, self.path,
+                                                       **kwargs)))
+
+    def test_offset_mode(self):
+        """OFFSET pages cover every row once, with or without prefetch."""
+        for prefetch in (False, True):
+            pages = self.pages(prefetch=prefetch)
+            self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+            rows = [row for page in pages for row in page]
+            self.assertEqual(sorted(rows, key=lambda row: row[self.KEY]),
+                             self.dicts(ROWS))
+
+    def test_keyset_mode_seeks_by_the_primary_key(self):
+        """Keyset pages come back in key order, with or without prefetch."""
+        for prefetch in (False, True):
+            pages = self.pages(keyset=True, prefetch=prefetch)
+            self.assertEqual([row for page in pages for row in page],
+                             self.dicts(ROWS))
+
+    def test_keyset_mode_with_an_explicit_key(self):
+        """key= picks another column; unknown columns are rejected."""
+        pages = self.pages(keyset=True, key="name")
+        names = [row["name"] for page in pages for row in page]
+        self.assertEqual(names, sorted(name for _, name, _ in ROWS))
+        with self.assertRaises(ValueError):
+            self.pages(keyset=True, key="name; DROP TABLE user_data")
+
+    def test_early_close_cancels_the_prefetch(self):
+        """Stopping after one page leaves no fetch running."""
+        async def main():
+            pages = await collect(alazy_pagination(5, self.path), limit=1)
+            others = asyncio.all_tasks() - {asyncio.current_task()}
+            return pages, others
+
+        pages, others = self.run_async(main())
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(others, set())
+
+
+class TestMySQLSchemaPagination(TestPagination):
+    """The same cases against the MySQL schema's user_id key."""
+
+    KEY = "user_id"
+
+
+if __name__ == '__main__':
+    unittest.main()
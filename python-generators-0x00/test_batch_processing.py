@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the 1-batch_processing module.
+"""
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pool
+
+batch_processing_module = importlib.import_module("1-batch_processing")
+batch_processing = batch_processing_module.batch_processing
+
+ROWS = [(i, f"user{i}", 18 + i % 20, "KE") for i in range(1, 51)]
+
+
+class TestBatchProcessing(unittest.TestCase):
+    """Test cases for batch_processing() against a pooled SQLite file."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE user_data (id INTEGER PRIMARY KEY, "
+                         "name TEXT, age INTEGER, country TEXT)")
+            conn.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)",
+                             ROWS)
+        self.addCleanup(os.remove, self.path)
+        patcher = patch.object(batch_processing_module, "DB_PATH", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: pool.get_pool(self.path).close_all())
+
+    def test_rows_come_through_the_pool(self):
+        """Filtered batches match the rows and the connection is reused."""
+        batches = list(batch_processing(batch_size=7))
+        expected = [row for row in ROWS if row[2] > 25]
+        self.assertEqual([row for batch in batches for row in batch],
+                         expected)
+        self.assertTrue(all(len(batch) <= 7 for batch in batches))
+        self.assertEqual(pool.get_pool(self.path).placeholder, "?")
+        self.assertEqual(len(pool.get_pool(self.path)._idle), 1)
+
+    def test_pushdown_and_python_filters_agree(self):
+        """The SQL and Python paths return the same users."""
+        filters = (("age", ">=", 30), ("id", "in", (31, 32, 33, 50)))
+        for columnar in (False, True):
+            for pushdown in (False, True):
+                batches = list(batch_processing(
+                    batch_size=10, columnar=columnar, filters=filters,
+                    pushdown=pushdown))
+                if columnar:
+                    ids = [i for batch in batches for i in batch["id"]]
+                else:
+                    ids = [row[0] for batch in batches for row in batch]
+                self.assertEqual(ids, [32, 33], (columnar, pushdown))
+
+    def test_empty_in_list_matches_nothing_in_sql(self):
+        """An empty `in` compiles to an always-false clause."""
+        compile_filters = batch_processing_module.compile_filters
+        self.assertEqual(compile_filters((("id", "in", ()),)),
+                         ("WHERE 1 = 0", (), []))
+        batches = list(batch_processing(filters=(("id", "in", []),)))
+        self.assertEqual(batches, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Unit tests for export.py.
+"""
+import csv
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+import export
+import pool
+
+batch_processing = importlib.import_module("1-batch_processing")
+
+ROWS = [(i, f"user{i}", 18 + i % 40, "KE" if i % 2 else "NG")
+        for i in range(1, 26)]
+
+
+def columnar(rows):
+    """Split rows into one columnar batch."""
+    return {name: [row[i] for row in rows]
+            for i, name in enumerate(export.COLUMNS)}
+
+
+class ExportTestCase(unittest.TestCase):
+    """Gives each test a scratch output directory."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def output(self, name):
+        return os.path.join(self.directory, name)
+
+
+class TestStdlibCSV(ExportTestCase):
+    """Test cases for the CSV export without pyarrow."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch.object(export, "pa", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_csv(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            return header, [(int(i), name, int(age), country)
+                            for i, name, age, country in reader]
+
+    def test_round_trip(self):
+        """Batches written by the stdlib writer read back unchanged."""
+        path = self.output("users.csv")
+        stats = export.export_users(
+            path, batches=[columnar(ROWS[:10]), columnar(ROWS[10:])])
+        self.assertEqual(stats["rows"], len(ROWS))
+        self.assertEqual(self.read_csv(path), (list(export.COLUMNS), ROWS))
+
+    def test_round_trip_from_the_database(self):
+        """A background export of user_data matches the table."""
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE user_data (id INTEGER PRIMARY KEY, "
+                         "name TEXT, age INTEGER, country TEXT)")
+            conn.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)",
+                             ROWS)
+        conn.close()
+        self.addCleanup(lambda: pool.get_pool(db_path).close_all())
+        path = self.output("users.csv")
+        with patch.object(batch_processing, "DB_PATH", db_path):
+            export.export_users(path, batch_size=7, background=True)
+        self.assertEqual(self.read_csv(path)[1], ROWS)
+
+    def test_formats_needing_pyarrow_are_refused(self):
+        """arrow and parquet raise ImportError without pyarrow."""
+        for fmt in ("arrow", "parquet"):
+            with self.assertRaisesRegex(ImportError, "pyarrow"):
+                export.open_writer(self.output(f"users.{fmt}"), fmt)
+
+
+class TestOpenWriter(ExportTestCase):
+    """Test cases for open_writer()."""
+
+    def test_unknown_format(self):
+        """Formats outside FORMATS are rejected before opening a file."""
+        path = self.output("users.xlsx")
+        with self.assertRaisesRegex(ValueError, "Unknown export format"):
+            export.open_writer(path, "xlsx")
+        self.assertFalse(os.path.exists(path))
+
+
+class TestParquet(ExportTestCase):
+    """Test cases for the pyarrow-backed Parquet export."""
+
+    def test_round_trip(self):
+        """Batches written as Parquet read back with the export schema."""
+        pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pa_parquet
+
+        path = self.output("users.parquet")
+        export.export_users(path, "parquet",
+                            batches=[columnar(ROWS[:10]),
+                                     columnar(ROWS[10:])])
+        table = pa_parquet.read_table(path)
+        self.assertEqual(table.schema, export.arrow_schema())
+        self.assertEqual(table.to_pydict(), columnar(ROWS))
+
+
+if __name__ == '__main__':
+    unittest.main()
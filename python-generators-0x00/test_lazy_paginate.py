@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Unit tests for 2-lazy_paginate: keyset pagination, cursor tokens and
+the read-ahead thread.
+"""
+import base64
+import gc
+import importlib
+import json
+import sqlite3
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import pool
+
+lazy_paginate = importlib.import_module("2-lazy_paginate")
+
+USERS = 23
+
+
+class StandInCursor:
+    """mysql-connector-style cursor (%s markers) over SQLite."""
+
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace("%s", "?"), params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+class StandInConnection:
+    """mysql-connector look-alike holding a small user_data table."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.execute("CREATE TABLE user_data (user_id TEXT PRIMARY "
+                          "KEY, name TEXT, email TEXT, age INTEGER)")
+        self.conn.executemany(
+            "INSERT INTO user_data VALUES (?, ?, ?, ?)",
+            ((f"u{i:03}", f"user{i}", f"user{i}@example.com", 20 + i)
+             for i in range(USERS)))
+
+    def cursor(self, prepared=False, **options):
+        return StandInCursor(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Points pool.get_pool() at a single stand-in connection."""
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool(StandInConnection, max_size=1,
+                                        health_check=None)
+        self.addCleanup(self.pool.close_all)
+        patcher = patch.object(pool, "get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def ids(pages):
+        return [row["user_id"] for page in pages for row in page]
+
+
+class TestKeysetPagination(PaginationTestCase):
+    """Test cases for keyset pagination and cursor tokens."""
+
+    def test_keyset_pages_match_offset_pages(self):
+        """Both modes yield every user once, in key order."""
+        expected = [f"u{i:03}" for i in range(USERS)]
+        self.assertEqual(self.ids(lazy_paginate.lazy_pagination(5)),
+                         expected)
+        self.assertEqual(self.ids(lazy_paginate.lazy_pagination(
+            5, keyset=True)), expected)
+
+    def test_resume_from_cursor_yields_exactly_the_rest(self):
+        """Resuming after any page continues with no gaps or repeats."""
+        everyone = self.ids(lazy_paginate.lazy_pagination(5, keyset=True))
+        for pages_read in range(1, 5):
+            pages = lazy_paginate.lazy_pagination(5, keyset=True)
+            first = [next(pages) for _ in range(pages_read)]
+            pages.close()
+            token = lazy_paginate.next_cursor(first[-1])
+            rest = lazy_paginate.lazy_pagination(5, cursor=token)
+            self.assertEqual(self.ids(first) + self.ids(rest), everyone)
+
+    def test_cursor_round_trip(self):
+        """Tokens decode to the key they were made from."""
+        for key in (42, "u007"):
+            self.assertEqual(lazy_paginate.decode_cursor(
+                lazy_paginate.encode_cursor(key)), key)
+        self.assertIsNone(lazy_paginate.next_cursor([]))
+
+    def test_malformed_tokens_are_rejected(self):
+        """Garbage, truncated or wrongly typed tokens raise ValueError."""
+        token = lazy_paginate.encode_cursor("u004")
+        for bad in ("", "not-a-token", token.split(".")[0], token + ".x",
+                    token[:-3], None, 5):
+            with self.assertRaisesRegex(ValueError, "(?i)pagination cursor"):
+                lazy_paginate.decode_cursor(bad)
+
+    def test_tampered_token_is_rejected(self):
+        """Editing the payload breaks the signature."""
+        token = lazy_paginate.encode_cursor("u004")
+        payload, signature = token.split(".")
+        data = json.loads(base64.urlsafe_b64decode(payload))
+        data["after"] = "u000"
+        forged = base64.urlsafe_b64encode(
+            json.dumps(data).encode()).decode() + "." + signature
+        with self.assertRaisesRegex(ValueError, "failed verification"):
+            lazy_paginate.decode_cursor(forged)
+        with self.assertRaisesRegex(ValueError, "failed verification"):
+            next(lazy_paginate.lazy_pagination(5, cursor=forged))
+
+
+class Source:
+    """Iterator that records how far it was read and whether it closed."""
+
+    def __init__(self, count, fail_at=None):
+        self.count = count
+        self.fail_at = fail_at
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed.is_set() or self.produced == self.count:
+            raise StopIteration
+        if self.produced == self.fail_at:
+            raise sqlite3.OperationalError("connection lost")
+        self.produced += 1
+        return self.produced
+
+    def close(self):
+        self.closed.set()
+
+
+def read_ahead_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name == "lazy-pagination-read-ahead"]
+
+
+class TestReadAhead(PaginationTestCase):
+    """Test cases for read_ahead() and prefetched_pagination()."""
+
+    def assertProducerStopped(self, source):
+        self.assertTrue(source.closed.wait(5))
+        for _ in range(100):
+            if not read_ahead_threads():
+                break
+            time.sleep(0.01)
+        self.assertEqual(read_ahead_threads(), [])
+
+    def test_items_arrive_in_order(self):
+        """Every item is yielded once, in source order."""
+        source = Source(50)
+        self.assertEqual(list(lazy_paginate.read_ahead(source, depth=3)),
+                         list(range(1, 51)))
+        self.assertProducerStopped(source)
+
+    def test_prefetched_pages_match_lazy_pages(self):
+        """prefetched_pagination yields the same pages as lazy_pagination."""
+        for keyset in (False, True):
+            self.assertEqual(
+                list(lazy_paginate.prefetched_pagination(5, keyset=keyset)),
+                list(lazy_paginate.lazy_pagination(5, keyset=keyset)))
+
+    def test_producer_error_is_raised_in_the_consumer(self):
+        """Items before the failure arrive, then the error is re-raised."""
+        source = Source(10, fail_at=4)
+        items = []
+        with self.assertRaisesRegex(sqlite3.OperationalError,
+                                    "connection lost"):
+            for item in lazy_paginate.read_ahead(source, depth=2):
+                items.append(item)
+        self.assertEqual(items, [1, 2, 3, 4])
+        self.assertProducerStopped(source)
+
+    def test_exceptions_yielded_as_items_are_not_raised(self):
+        """Only errors from the source are raised, not values it yields."""
+        error = ValueError("just a value")
+        self.assertEqual(list(lazy_paginate.read_ahead([error, 1])),
+                         [error, 1])
+
+    def test_early_close_stops_a_producer_blocked_on_a_full_queue(self):
+        """close() while the buffer is full ends the thread promptly."""
+        source = Source(10_000)
+        pages = lazy_paginate.read_ahead(source, depth=1)
+        self.assertEqual(next(pages), 1)
+        time.sleep(0.1)  # let the producer fill the buffer and block
+        started = time.monotonic()
+        pages.close()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertProducerStopped(source)
+        self.assertLess(source.produced, 10)
+
+    def test_garbage_collection_stops_the_producer(self):
+        """Dropping an unfinished generator stops its thread too."""
+        source = Source(10_000)
+        pages = lazy_paginate.read_ahead(source, depth=1)
+        next(pages)
+        del pages
+        gc.collect()
+        self.assertProducerStopped(source)
+
+
+if __name__ == '__main__':
+    unittest.main()
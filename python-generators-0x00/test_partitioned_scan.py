@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the partitioned_scan module.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from functools import partial
+
+from partitioned_scan import (partition_ranges, partitioned_aggregate,
+                              partitioned_rows, sqlite_connection)
+
+
+class TestPartitionedScan(unittest.TestCase):
+    """Test cases for range-partitioned scans."""
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        with sqlite_connection(cls.path) as conn:
+            conn.execute("CREATE TABLE user_data "
+                         "(id INTEGER PRIMARY KEY, age INTEGER)")
+            conn.executemany("INSERT INTO user_data VALUES (?, ?)",
+                             [(i, 18 + i % 50) for i in range(1, 10001)])
+            conn.commit()
+        cls.scope = partial(sqlite_connection, cls.path)
+        cls.ages = [18 + i % 50 for i in range(1, 10001)]
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+
+    def test_partition_ranges_cover_range_once(self):
+        """Chunks are contiguous and cover every key exactly once."""
+        ranges = partition_ranges(1, 10, 3)
+        self.assertEqual(ranges, [(1, 5), (5, 8), (8, 11)])
+        self.assertEqual(partition_ranges(5, 6, 8), [(5, 6), (6, 7)])
+        self.assertEqual(partition_ranges(None, None, 4), [])
+
+    def test_partitioned_rows_returns_every_row(self):
+        """The unordered stream yields each row exactly once."""
+        rows = list(partitioned_rows(self.scope, "user_data", ("id", "age"),
+                                     "id", partitions=4, fetch_size=100))
+        self.assertEqual(sorted(r[0] for r in rows), list(range(1, 10001)))
+
+    def test_partitioned_aggregate_matches_single_pass(self):
+        """Merged partials equal the single-pass statistics."""
+        for processes in (False, True):
+            stats = partitioned_aggregate(self.scope, "user_data", "age",
+                                          "id", partitions=3,
+                                          processes=processes)
+            self.assertEqual(stats.moments.count, len(self.ages))
+            self.assertEqual(stats.moments.total, sum(self.ages))
+            self.assertEqual(stats.moments.min, 18)
+            self.assertEqual(stats.moments.max, 67)
+
+    def test_worker_errors_propagate(self):
+        """An error in a worker surfaces in the consumer."""
+        with self.assertRaises(sqlite3.OperationalError):
+            list(partitioned_rows(self.scope, "user_data", ("missing",),
+                                  "id", partitions=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
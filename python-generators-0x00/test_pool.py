@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pool.ConnectionPool: checkout health checks, idle
+eviction, the size bound and the statement cache.
+"""
+import importlib
+import threading
+import unittest
+from unittest.mock import patch
+
+import pool
+
+lazy_paginate = importlib.import_module("2-lazy_paginate")
+
+
+class FakeCursor:
+    """Cursor that records its options and the statements it ran."""
+
+    description = (("user_id",), ("name",))
+
+    def __init__(self, **options):
+        self.options = options
+        self.closed = False
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [("u1", "Ada"), ("u2", "Alan")]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """
+    Connection whose cursor() behaves like mysql-connector: prepared
+    cursors exist, but not in combination with dictionary=True.
+    """
+
+    def __init__(self, prepared=True):
+        self.supports_prepared = prepared
+        self.closed = False
+
+    def cursor(self, prepared=False, **options):
+        if prepared and not self.supports_prepared:
+            raise TypeError("unexpected keyword argument 'prepared'")
+        if prepared and options.get("dictionary"):
+            raise ValueError("Cursor not available with given criteria: "
+                             "dictionary, prepared")
+        if prepared:
+            options["prepared"] = True
+        return FakeCursor(**options)
+
+    def is_connected(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTime:
+    """Stands in for the time module with a manually advanced clock."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for checkout, release and eviction."""
+
+    def setUp(self):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        self.pool = pool.ConnectionPool(connect, max_size=2,
+                                        idle_timeout=60)
+
+    def test_released_connection_is_reused(self):
+        """A healthy returned connection is handed out again."""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        """A pooled connection failing its health check is closed."""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.closed = True  # the server dropped it while idle
+        fresh = self.pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(len(self.pool._idle), 0)
+
+    def test_idle_connections_are_evicted(self):
+        """Connections idle longer than idle_timeout are closed."""
+        clock = FakeTime()
+        with patch.object(pool, "time", clock):
+            old, recent = self.pool.acquire(), self.pool.acquire()
+            self.pool.release(old)
+            clock.now += 50
+            self.pool.release(recent)
+            clock.now += 20
+            self.assertIs(self.pool.acquire(), recent)
+            self.assertTrue(old.closed)
+            self.assertEqual(len(self.pool._idle), 0)
+
+    def test_checkout_blocks_at_max_size(self):
+        """A third checkout waits for a release, or times out."""
+        first, _ = self.pool.acquire(), self.pool.acquire()
+        with self.assertRaises(pool.PoolTimeout):
+            self.pool.acquire(timeout=0.05)
+
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(
+            self.pool.acquire(timeout=5)))
+        waiter.start()
+        waiter.join(0.05)
+        self.assertEqual(got, [])
+        self.pool.release(first)
+        waiter.join(5)
+        self.assertEqual(got, [first])
+
+    def test_failed_block_discards_its_connection(self):
+        """An exception inside connection() closes instead of pooling."""
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection() as conn:
+                raise RuntimeError("half-read result set")
+        self.assertTrue(conn.closed)
+        self.assertEqual(len(self.pool._idle), 0)
+        self.pool.acquire(timeout=0.05)
+        self.pool.acquire(timeout=0.05)  # both slots were freed
+
+
+class TestPrepared(unittest.TestCase):
+    """Test cases for ConnectionPool.prepared() and statement_stats()."""
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool(FakeConnection)
+
+    def test_cursor_is_cached_per_statement_and_options(self):
+        """The same SQL and options return the cached cursor."""
+        conn = self.pool.acquire()
+        cursor = self.pool.prepared(conn, "SELECT ?")
+        self.assertEqual(cursor.options, {"prepared": True})
+        self.assertIs(self.pool.prepared(conn, "SELECT ?"), cursor)
+        self.assertIsNot(self.pool.prepared(conn, "SELECT ?",
+                                            buffered=True), cursor)
+        self.assertEqual(self.pool.statement_stats(),
+                         {"hits": 1, "misses": 2, "cached": 2})
+
+    def test_falls_back_to_a_plain_cursor(self):
+        """TypeError and ValueError from cursor() give a plain cursor."""
+        conn = self.pool.acquire()
+        cursor = self.pool.prepared(conn, "SELECT ?", dictionary=True)
+        self.assertEqual(cursor.options, {"dictionary": True})
+        other = FakeConnection(prepared=False)
+        self.assertEqual(self.pool.prepared(other, "SELECT ?").options, {})
+
+    def test_close_evicts_the_connections_cursors(self):
+        """Discarding a connection closes and forgets its cursors."""
+        conn = self.pool.acquire()
+        cursor = self.pool.prepared(conn, "SELECT ?")
+        self.pool.discard(conn)
+        self.assertTrue(cursor.closed)
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.statement_stats()["cached"], 0)
+        conn = self.pool.acquire()
+        self.assertIsNot(self.pool.prepared(conn, "SELECT ?"), cursor)
+        self.assertEqual(self.pool.statement_stats(),
+                         {"hits": 0, "misses": 2, "cached": 1})
+
+
+class TestPaginatorStatements(unittest.TestCase):
+    """The paginators' call shape gets a real prepared cursor."""
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool(FakeConnection)
+        patcher = patch.object(pool, "get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_paginators_use_prepared_cursors(self):
+        """Pages come from prepared tuple cursors, built into dicts."""
+        expected = [{"user_id": "u1", "name": "Ada"},
+                    {"user_id": "u2", "name": "Alan"}]
+        for fetch in (lambda: lazy_paginate.paginate_users(2, 0),
+                      lambda: lazy_paginate.paginate_users_after(2, "u0")):
+            self.assertEqual(fetch(), expected)
+            self.assertEqual(fetch(), expected)
+        conn = self.pool.acquire()
+        cursors = self.pool._statements[id(conn)].values()
+        self.assertEqual([cursor.options for cursor in cursors],
+                         [{"prepared": True}] * 2)
+        self.assertEqual(self.pool.statement_stats(),
+                         {"hits": 2, "misses": 2, "cached": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
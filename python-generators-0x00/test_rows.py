@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for rows.UserRow and the row_factory option of the streamers.
+"""
+import importlib
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import pool
+from rows import UserRow
+
+stream_users = importlib.import_module("0-stream_users").stream_users
+lazy_paginate = importlib.import_module("2-lazy_paginate")
+
+ROW = {"user_id": "u1", "name": "Ada", "email": "ada@example.com",
+       "age": 36}
+
+
+def dict_row(cursor, row):
+    """Row factory mimicking mysql-connector's dictionary cursors."""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class StandInCursor(sqlite3.Cursor):
+    """sqlite3 cursor accepting mysql-connector's %s markers."""
+
+    def execute(self, sql, params=()):
+        return super().execute(sql.replace("%s", "?"), params)
+
+
+class StandInConnection:
+    """mysql-connector look-alike holding a small user_data table."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE user_data (user_id TEXT PRIMARY "
+                          "KEY, name TEXT, email TEXT, age INTEGER)")
+        self.conn.executemany(
+            "INSERT INTO user_data VALUES (?, ?, ?, ?)",
+            ((f"u{i:02}", f"user{i}", f"user{i}@example.com", 20 + i)
+             for i in range(12)))
+
+    def cursor(self, dictionary=False, buffered=None, prepared=False):
+        cursor = self.conn.cursor(StandInCursor)
+        if dictionary:
+            cursor.row_factory = dict_row
+        return cursor
+
+    def close(self):
+        self.conn.close()
+
+
+class TestUserRow(unittest.TestCase):
+    """Test cases for UserRow."""
+
+    def test_dict_round_trip(self):
+        """from_dict() and to_dict() preserve every field."""
+        row = UserRow.from_dict(ROW)
+        self.assertEqual((row.user_id, row.name, row.email, row.age),
+                         ("u1", "Ada", "ada@example.com", 36))
+        self.assertEqual(row.to_dict(), ROW)
+        self.assertEqual(UserRow.from_dict(row.to_dict()), row)
+
+    def test_item_access(self):
+        """row[key] works for fields and raises KeyError otherwise."""
+        row = UserRow.from_dict(ROW)
+        for key, value in ROW.items():
+            self.assertEqual(row[key], value)
+        with self.assertRaises(KeyError):
+            row["to_dict"]
+
+    def test_equality_and_repr(self):
+        """Rows compare by value and are not equal to dicts."""
+        row = UserRow.from_dict(ROW)
+        self.assertNotEqual(row, UserRow.from_dict({**ROW, "age": 37}))
+        self.assertNotEqual(row, ROW)
+        self.assertEqual(repr(row), "UserRow(user_id='u1', name='Ada', "
+                                    "email='ada@example.com', age=36)")
+
+    def test_no_instance_dict(self):
+        """Slots only: arbitrary attributes can't be added."""
+        with self.assertRaises(AttributeError):
+            UserRow.from_dict(ROW).extra = 1
+
+
+class TestRowFactory(unittest.TestCase):
+    """Test cases for row_factory=UserRow.from_dict in the streamers."""
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool(StandInConnection, max_size=1,
+                                        health_check=None)
+        self.addCleanup(self.pool.close_all)
+        patcher = patch.object(pool, "get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertSameRows(self, rows, dicts):
+        self.assertTrue(all(isinstance(row, UserRow) for row in rows))
+        self.assertEqual([row.to_dict() for row in rows], dicts)
+
+    def test_stream_users(self):
+        """Both cursor modes yield UserRows matching the dict rows."""
+        for fetch_size in (None, 5):
+            dicts = list(stream_users(fetch_size))
+            self.assertEqual(len(dicts), 12)
+            self.assertSameRows(
+                list(stream_users(fetch_size, UserRow.from_dict)), dicts)
+
+    def test_lazy_pagination(self):
+        """Pages hold UserRows matching the dict pages."""
+        for keyset in (False, True):
+            dicts = [row for page in lazy_paginate.lazy_pagination(
+                5, keyset) for row in page]
+            rows = [row for page in lazy_paginate.lazy_pagination(
+                5, keyset, row_factory=UserRow.from_dict) for row in page]
+            self.assertSameRows(rows, dicts)
+
+
+if __name__ == '__main__':
+    unittest.main()
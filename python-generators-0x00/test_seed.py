@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the seed module: bulk loading, reproducibility and the
+EXPLAIN QUERY PLAN checks for the project's known queries.
+"""
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import seed
+
+COUNTS = {"users": 300, "properties": 100, "bookings": 1000, "reviews": 800}
+
+
+def seeded_database(**kwargs):
+    """Return an in-memory database seeded with COUNTS rows."""
+    conn = sqlite3.connect(":memory:")
+    seed.create_tables(conn)
+    seed.seed_database(conn, COUNTS, seed=7, chunk_size=256, **kwargs)
+    return conn
+
+
+def snapshot(conn):
+    """All generated columns of every table (no CURRENT_TIMESTAMPs)."""
+    return [conn.execute(sql).fetchall() for sql in (
+        "SELECT id, name, email FROM users",
+        "SELECT * FROM properties",
+        "SELECT id, user_id, property_id, check_in, check_out, total_amount "
+        "FROM bookings",
+        "SELECT * FROM payments",
+        "SELECT id, property_id, user_id, rating, comment FROM reviews",
+    )]
+
+
+class TestSeed(unittest.TestCase):
+    """Test cases for the bulk seeder."""
+
+    def test_row_counts_and_foreign_keys(self):
+        """Every table gets its rows and every foreign key resolves."""
+        conn = seeded_database()
+        for table, count in {**COUNTS, "payments": 1000}.items():
+            (rows,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            self.assertEqual(rows, count)
+        dangling = conn.execute('''
+            SELECT
+              (SELECT COUNT(*) FROM properties p
+               LEFT JOIN users u ON u.id = p.host_id WHERE u.id IS NULL) +
+              (SELECT COUNT(*) FROM bookings b
+               LEFT JOIN properties p ON p.id = b.property_id
+               WHERE p.id IS NULL) +
+              (SELECT COUNT(*) FROM payments pay
+               LEFT JOIN bookings b ON b.id = pay.booking_id
+               WHERE b.id IS NULL)
+        ''').fetchone()[0]
+        self.assertEqual(dangling, 0)
+
+    def test_same_seed_same_data_for_any_worker_count(self):
+        """Sharded generation is reproducible and worker-independent."""
+        self.assertEqual(snapshot(seeded_database()),
+                         snapshot(seeded_database(workers=2)))
+
+    def test_known_queries_use_indexes(self):
+        """After seeding, no known query falls back to a full scan."""
+        self.assertEqual(seed.check_query_plans(seeded_database()), {})
+
+    def test_missing_indexes_are_reported(self):
+        """Without the secondary indexes the checker flags full scans."""
+        problems = seed.check_query_plans(seeded_database(indexes=False))
+        self.assertIn("payments_by_booking", problems)
+        self.assertIn("reviews_by_property", problems)
+
+    def test_user_data_age_index_when_table_exists(self):
+        """The age filter is indexed once user_data is present."""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE user_data "
+                     "(id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        self.assertIn("user_data_by_age", seed.check_query_plans(conn))
+        self.assertIn("idx_user_data_age", seed.create_indexes(conn))
+        self.assertEqual(seed.check_query_plans(conn), {})
+
+    def test_cli_check_plans(self):
+        """The CLI seeds a database file and passes --check-plans."""
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        for suffix in ("-wal", "-shm"):
+            self.addCleanup(lambda p=path + suffix: os.path.exists(p)
+                            and os.remove(p))
+        with redirect_stdout(io.StringIO()):
+            seed.main(["--db", path, "--seed", "1", "--users", "50",
+                       "--check-plans"])
+        with sqlite3.connect(path) as conn:
+            (users,) = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+            (mode,) = conn.execute("PRAGMA journal_mode").fetchone()
+        self.assertEqual(users, 50)
+        self.assertEqual(mode, "delete")
+
+    def test_reseeding_appends_after_existing_ids(self):
+        """A second run continues each table's ids; --reset starts over."""
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        args = ["--db", path, "--users", "20", "--properties", "10",
+                "--bookings", "30", "--reviews", "5"]
+        with redirect_stdout(io.StringIO()):
+            seed.main(args)
+            seed.main(args + ["--seed", "3"])
+        with sqlite3.connect(path) as conn:
+            self.assertEqual(conn.execute(
+                "SELECT COUNT(*), MAX(id) FROM bookings").fetchone(), (60, 60))
+            unpaid = conn.execute(
+                "SELECT COUNT(*) FROM bookings b LEFT JOIN payments p "
+                "ON p.booking_id = b.id WHERE p.id IS NULL").fetchone()[0]
+        self.assertEqual(unpaid, 0)
+        with redirect_stdout(io.StringIO()):
+            seed.main(args + ["--reset"])
+        with sqlite3.connect(path) as conn:
+            (users,) = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+        self.assertEqual(users, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
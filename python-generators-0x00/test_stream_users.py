@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the server-side streaming mode of stream_users.
+
+The MySQL database is replaced by an SQLite stand-in whose `user_data`
+is a view over a recursive CTE, so any number of rows can be streamed
+without ever being stored.
+
+Set STREAM_USERS_ROWS to change the size of the synthetic table.
+"""
+import importlib
+import os
+import sqlite3
+import tracemalloc
+import unittest
+from itertools import islice
+from unittest.mock import patch
+
+import pool
+
+stream_users = importlib.import_module("0-stream_users").stream_users
+
+SYNTHETIC_ROWS = int(os.environ.get("STREAM_USERS_ROWS", 200_000))
+FETCH_SIZE = 1000
+
+
+def traced_peak(rows):
+    """Consume `rows` and return the peak bytes traced meanwhile."""
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in rows)
+        return count, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def dict_row(cursor, row):
+    """Row factory mimicking mysql-connector's dictionary cursors."""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class SQLiteStandIn:
+    """Minimal mysql-connector look-alike backed by SQLite."""
+
+    def __init__(self, rows):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(f'''
+            CREATE VIEW user_data AS
+            WITH RECURSIVE seq(n) AS (
+                SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {rows}
+            )
+            SELECT n AS user_id, 'user' || n AS name,
+                   'user' || n || '@example.com' AS email,
+                   18 + n % 60 AS age
+            FROM seq
+        ''')
+        self.closed = False
+
+    def cursor(self, dictionary=False, buffered=None):
+        cursor = self.conn.cursor()
+        if dictionary:
+            cursor.row_factory = dict_row
+        return cursor
+
+    def close(self):
+        self.closed = True
+        self.conn.close()
+
+
+class TestStreamUsersServerSide(unittest.TestCase):
+    """Test cases for stream_users(fetch_size=...)."""
+
+    def setUp(self):
+        self.connections = []
+
+        def connect():
+            conn = SQLiteStandIn(SYNTHETIC_ROWS)
+            self.connections.append(conn)
+            return conn
+
+        self.pool = pool.ConnectionPool(connect, max_size=1)
+        patcher = patch("pool.get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_memory_stays_within_one_batch(self):
+        """Streaming the whole table never holds more than one batch."""
+        first = stream_users(fetch_size=FETCH_SIZE)
+        _, one_batch = traced_peak(islice(first, FETCH_SIZE))
+        first.close()
+        count, peak = traced_peak(stream_users(fetch_size=FETCH_SIZE))
+        self.assertEqual(count, SYNTHETIC_ROWS)
+        # The previous batch is still referenced while the next one is
+        # fetched; anything that grows with the table is far larger.
+        self.assertLess(peak, 3 * one_batch)
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_early_close_cancels_query(self):
+        """Closing the generator early drops the connection."""
+        users = stream_users(fetch_size=100)
+        first = list(islice(users, 5))
+        users.close()
+        self.assertEqual([u["user_id"] for u in first], [1, 2, 3, 4, 5])
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(len(self.pool._idle), 0)
+        # The slot was freed, so a new stream can start immediately.
+        self.assertEqual(next(stream_users(fetch_size=10))["user_id"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()